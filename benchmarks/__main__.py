@@ -0,0 +1,108 @@
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from .suite import CASES, real_datasets, synthetic_datasets
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def measure(function, repeat, min_time=0.2):
+    """
+    Returns the best wall time of function over repeat runs (more if they take less than
+    min_time in total) and its peak memory allocated through Python and NumPy in a
+    separate run, since tracing allocations slows the function down.
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat or (time.perf_counter() - start < min_time and len(times) < 1000):
+        gc.collect()
+        run_start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - run_start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the measurements of results that exceed their baseline by more than the
+    tolerance (a fraction), as (benchmark, metric, value, baseline value) tuples.
+    """
+    regressions = []
+    for key, result in results.items():
+        for metric in ('seconds', 'peak_bytes'):
+            if key in baseline and result[metric] > baseline[key][metric] * (1 + tolerance):
+                regressions.append((key, metric, result[metric], baseline[key][metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="benchmark the preprocessing functions of utils.py")
+    parser.add_argument('--rows', type=int, nargs='*', default=[1_000_000, 10_000_000],
+                        help="numbers of rows of the synthetic datasets")
+    parser.add_argument('--columns', type=int, nargs='*', default=[2000],
+                        help="numbers of columns of the wide synthetic datasets")
+    parser.add_argument('--wide-rows', type=int, default=10_000, help="number of rows of the wide synthetic datasets")
+    parser.add_argument('--no-real', action='store_true', help="skip the bundled csv files")
+    parser.add_argument('-k', '--filter', default='*', help="glob pattern of the benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=3, help="minimum number of timed runs per benchmark")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="json file with the baseline results")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="relative slowdown or memory increase flagged as regression")
+    args = parser.parse_args(argv)
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline}, create it with --save-baseline "
+                     f"(baselines are machine specific and are not committed)")
+
+    datasets = [] if args.no_real else real_datasets()
+    results = {}
+    for source in (datasets, synthetic_datasets(args.rows, args.columns, args.wide_rows)):
+        for dataset in source:
+            for case_name, case in CASES.items():
+                key = f'{case_name}:{dataset.name}'
+                if not fnmatch.fnmatch(key, args.filter):
+                    continue
+                results[key] = measure(case(dataset), args.repeat)
+                print(f"{key:90s} {results[key]['seconds'] * 1000:12.3f} ms "
+                      f"{results[key]['peak_bytes'] / 1024 ** 2:10.1f} MB", flush=True)
+            del dataset
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    for key, metric, value, base in regressions:
+        print(f"Regression: {key} {metric} {value:.6g} (baseline {base:.6g}, +{value / base - 1:.0%})")
+    # Benchmarks that are not in the baseline cannot be compared
+    unmeasured = [] if args.save_baseline else [key for key in results if key not in baseline]
+    for key in unmeasured:
+        print(f"No baseline: {key}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': baseline},
+                      file, indent=1, sort_keys=True)
+    return 1 if regressions or unmeasured else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import contextlib
+import glob
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import utils
+from utils import DATA_DIR, FAIRNESS_ROLES, load_feature_schema
+from treatment_datasets.synthetic import generate_chunk, schema_profile
+
+
+# Datasets with a bundled raw csv file and feature YAML
+REAL_DATASETS = ['compas-scores-two-years', 'mimic-III-sepsis']
+
+ICD9_CODES = np.array(['250.01', '276', '428', '414', 'V45', 'E878', '?', '38', '785', '996.81', '486', '599'])
+
+
+def raw_schema_paths(data_dir=DATA_DIR):
+    """
+    Returns the feature YAMLs of data_dir that list features by name (the preprocessed
+    YAMLs use column indices), sorted.
+    """
+    paths = []
+    for path in sorted(glob.glob(os.path.join(data_dir, '*', 'features*.yaml'))):
+        schema = load_feature_schema(path)
+        if schema.feature_to_role and all(isinstance(feature, str) for feature in schema.feature_to_role):
+            paths.append(path)
+    return paths
+
+
+def widen_schema(schema, n_columns):
+    """
+    Returns the YAML string of a schema with about n_columns features, made of copies of
+    the features of schema with the suffixes __1, __2, ... in the same roles and types.
+    """
+    features = list(schema.feature_to_role)
+    copies = max(-(-n_columns // max(len(features), 1)), 1)
+
+    def widen(feature_lists):
+        return {
+            group: {
+                'num': len(group_features) * copies,
+                'features': [feature if copy == 0 else f'{feature}__{copy}'
+                             for copy in range(copies) for feature in group_features],
+            }
+            for group, group_features in feature_lists.items()
+        }
+
+    return yaml.safe_dump({'dataset': {
+        'name': f'{schema.name}-wide',
+        'n_samples': schema.n_samples,
+        'structural': widen(schema.structural),
+        'fairness': widen(schema.fairness),
+    }}, sort_keys=False)
+
+
+def synthetic_frame(schema, n_rows, seed=0):
+    """
+    Generates a dataframe with the features of schema (see schema_profile()).
+    """
+    return generate_chunk(schema_profile(schema, seed), n_rows, seed)
+
+
+class Dataset:
+    """
+    Input of the benchmark cases: a dataframe and its feature schema, given as a YAML file
+    or string. The dataframe is created by load() when it is first used, so that datasets
+    without selected benchmarks are not generated.
+    """
+
+    def __init__(self, name, load, yaml_path=None, yaml_string=None):
+        self.name = name
+        self.load = load
+        self.yaml_path = yaml_path
+        self.yaml_string = yaml_string
+        self.schema = load_feature_schema(yaml_path, yaml_string)
+        self._df = None
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = self.load()
+        return self._df
+
+    @property
+    def schema_args(self):
+        return dict(yaml_path=self.yaml_path, yaml_string=self.yaml_string)
+
+    def feature_dicts(self):
+        columns = self.df.columns
+        fairness_dict = {role: self.schema.get_features(role, columns) for role in FAIRNESS_ROLES if role != 'other'}
+        structural_dict = {structure_type: self.schema.get_structural_features(structure_type, columns)
+                           for structure_type in ('numerical', 'categorical')}
+        return fairness_dict, structural_dict
+
+
+def real_datasets(data_dir=DATA_DIR):
+    for name in REAL_DATASETS:
+        csv_path, yaml_path = utils.get_dataset_paths(name, 'raw', data_dir)
+        if os.path.exists(csv_path):
+            yield Dataset(name, lambda csv_path=csv_path: pd.read_csv(csv_path), yaml_path=yaml_path)
+
+
+def synthetic_datasets(rows, columns, wide_rows, data_dir=DATA_DIR):
+    """
+    Yields a synthetic dataset for each raw feature YAML of data_dir and each number of
+    rows, and one with each number of columns (and wide_rows rows).
+    """
+    for path in raw_schema_paths(data_dir):
+        schema = load_feature_schema(path)
+        label = os.path.basename(os.path.dirname(path))
+        for n_rows in rows:
+            yield Dataset(f'{label}[{n_rows}x{len(schema.feature_to_role)}]',
+                          lambda schema=schema, n_rows=n_rows: synthetic_frame(schema, n_rows), yaml_path=path)
+        for n_columns in columns:
+            yaml_string = widen_schema(schema, n_columns)
+            wide_schema = load_feature_schema(yaml_string=yaml_string)
+            yield Dataset(f'{label}[{wide_rows}x{len(wide_schema.feature_to_role)}]',
+                          lambda schema=wide_schema: synthetic_frame(schema, wide_rows), yaml_string=yaml_string)
+
+
+def _quiet(function, *args, **kwargs):
+    # Benchmarked functions print warnings about ignored features
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+# Each case maps a Dataset to the function that is timed, with the setup done beforehand
+
+def case_missing_values(dataset):
+    return lambda: utils.calculate_nan_percentage_of_grouped_features(dataset.df, **dataset.schema_args)
+
+
+def case_create_yaml_structure(dataset):
+    fairness_dict, structural_dict = dataset.feature_dicts()
+    return lambda: _quiet(utils.create_yaml_structure, dataset.df, fairness_dict, structural_dict, dataset.name)
+
+
+def case_reorder_columns_by_dict(dataset):
+    fairness_dict, _ = dataset.feature_dicts()
+    return lambda: _quiet(utils.reorder_columns_by_dict, dataset.df, fairness_dict)
+
+
+def case_maintain_order_columns(dataset):
+    categorical_features = dataset.schema.get_structural_features('categorical', dataset.df.columns)
+    encoded, _ = utils.one_hot_encode(dataset.df, categorical_features)
+    original_order = list(dataset.df.columns)
+    return lambda: utils.maintain_order_columns(encoded, original_order, categorical_features)
+
+
+def case_getters(dataset):
+    def run():
+        utils.get_numerical_features(dataset.df, **dataset.schema_args)
+        utils.get_categorical_features(dataset.df, **dataset.schema_args)
+        utils.get_sensitive_features(**dataset.schema_args)
+        utils.get_covariate_features(**dataset.schema_args)
+        utils.get_treatment_features(**dataset.schema_args)
+        utils.get_target_features(**dataset.schema_args)
+    return run
+
+
+def case_map_icd9_category(dataset):
+    codes = _icd9_codes(len(dataset.df))
+    return lambda: codes.map(utils.map_icd9_category)
+
+
+def case_map_icd9_category_series(dataset):
+    codes = _icd9_codes(len(dataset.df))
+    return lambda: utils.map_icd9_category_series(codes)
+
+
+def _icd9_codes(n_rows, seed=0):
+    return pd.Series(ICD9_CODES[np.random.default_rng(seed).integers(len(ICD9_CODES), size=n_rows)])
+
+
+CASES = {
+    'calculate_nan_percentage_of_grouped_features': case_missing_values,
+    'create_yaml_structure': case_create_yaml_structure,
+    'reorder_columns_by_dict': case_reorder_columns_by_dict,
+    'maintain_order_columns': case_maintain_order_columns,
+    'getters': case_getters,
+    'map_icd9_category': case_map_icd9_category,
+    'map_icd9_category_series': case_map_icd9_category_series,
+}
@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# utils.py and the treatment_datasets package are imported from the repository root
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIR)
+
+MEDICATIONS = [
+    'metformin', 'repaglinide', 'nateglinide', 'chlorpropamide', 'glimepiride', 'acetohexamide', 'glipizide',
+    'glyburide', 'tolbutamide', 'pioglitazone', 'rosiglitazone', 'acarbose', 'miglitol', 'troglitazone',
+    'tolazamide', 'examide', 'citoglipton', 'insulin', 'glyburide-metformin', 'glipizide-metformin',
+    'glimepiride-pioglitazone', 'metformin-rosiglitazone', 'metformin-pioglitazone',
+]
+ICD9_CODES = ['250.83', '276', '648', '8', '197', '414', 'V57', 'E888', '?', '428', '250', '996.1', '780', '403']
+
+
+def diabetes_data(n_rows, seed=0):
+    """
+    Returns synthetic raw data with the columns and kinds of values of the diabetes dataset
+    (sentinels '?', 'Unknown/Invalid' genders, ICD9 codes, mostly 'No' medications).
+    """
+    rng = np.random.default_rng(seed)
+    columns = {
+        'encounter_id': np.arange(n_rows) * 7 + 12522,
+        'patient_nbr': rng.integers(1, 10 ** 8, n_rows),
+        'race': rng.choice(['Caucasian', 'AfricanAmerican', '?', 'Other', 'Asian', 'Hispanic'], n_rows),
+        'gender': rng.choice(['Female', 'Male'], n_rows),
+        'age': rng.choice([f'[{start}-{start + 10})' for start in range(0, 100, 10)], n_rows),
+        'weight': rng.choice(['?', '[75-100)', '[50-75)'], n_rows, p=[0.97, 0.02, 0.01]),
+        'admission_type_id': rng.integers(1, 9, n_rows),
+        'discharge_disposition_id': rng.integers(1, 29, n_rows),
+        'admission_source_id': rng.integers(1, 26, n_rows),
+        'time_in_hospital': rng.integers(1, 15, n_rows),
+        'payer_code': rng.choice(['?', 'MC', 'HM', 'SP'], n_rows),
+        'medical_specialty': rng.choice(['?', 'InternalMedicine', 'Cardiology', 'Surgery-General'], n_rows),
+        'num_lab_procedures': rng.integers(1, 133, n_rows),
+        'num_procedures': rng.integers(0, 7, n_rows),
+        'num_medications': rng.integers(1, 82, n_rows),
+        'number_outpatient': rng.integers(0, 43, n_rows),
+        'number_emergency': rng.integers(0, 77, n_rows),
+        'number_inpatient': rng.integers(0, 22, n_rows),
+        'diag_1': rng.choice(ICD9_CODES, n_rows),
+        'diag_2': rng.choice(ICD9_CODES, n_rows),
+        'diag_3': rng.choice(ICD9_CODES, n_rows),
+        'number_diagnoses': rng.integers(1, 17, n_rows),
+        'max_glu_serum': rng.choice(['None', '>300', 'Norm', '>200'], n_rows),
+        'A1Cresult': rng.choice(['None', '>7', '>8', 'Norm'], n_rows),
+    }
+    for position, medication in enumerate(MEDICATIONS):
+        frequencies = [0.5, 0.3, 0.1, 0.1] if position % 3 == 0 else [0.99, 0.005, 0.003, 0.002]
+        columns[medication] = rng.choice(['No', 'Steady', 'Up', 'Down'], n_rows, p=frequencies)
+    columns['examide'][:] = 'No'
+    columns['gender'][rng.choice(n_rows, 3, replace=False)] = 'Unknown/Invalid'
+    columns['change'] = rng.choice(['No', 'Ch'], n_rows)
+    columns['diabetesMed'] = rng.choice(['Yes', 'No'], n_rows)
+    columns['readmitted'] = rng.choice(['NO', '>30', '<30'], n_rows)
+    return pd.DataFrame(columns)
+
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    """
+    Data directory with the diabetes pipeline on synthetic raw data (3000 rows), the
+    mimic-III-sepsis pipeline on its bundled raw data and the raw compas-scores-two-years
+    data.
+    """
+    data_dir = tmp_path_factory.mktemp('data')
+    for name, file_names in [('diabetes', ['features_raw.yaml', 'pipeline.yaml']),
+                             ('mimic-III-sepsis', ['data.csv', 'features_raw.yaml', 'pipeline.yaml']),
+                             ('compas-scores-two-years', ['data.csv', 'features_raw.yaml'])]:
+        os.makedirs(data_dir / name)
+        for file_name in file_names:
+            shutil.copyfile(os.path.join(REPOSITORY_DIR, 'data', name, file_name), data_dir / name / file_name)
+    diabetes_data(3000).to_csv(data_dir / 'diabetes' / 'data.csv', index=False)
+    return str(data_dir)
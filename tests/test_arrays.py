@@ -0,0 +1,26 @@
+import numpy as np
+
+from treatment_datasets.arrays import _column_selection, _role_view
+
+
+ARRAY = np.arange(40, dtype=np.float32).reshape(4, 10)
+
+
+def test_consecutive_columns_are_a_view():
+    view = _role_view(ARRAY, [_column_selection([2, 3, 4]), _column_selection([5, 6])])
+    assert np.shares_memory(view, ARRAY)
+    np.testing.assert_array_equal(view, ARRAY[:, 2:7])
+
+
+def test_columns_keep_their_order():
+    assert _column_selection([4, 3, 2]) == {'indices': [4, 3, 2]}
+    np.testing.assert_array_equal(_role_view(ARRAY, [_column_selection([7, 1, 5])]), ARRAY[:, [7, 1, 5]])
+
+
+def test_roles_keep_their_order():
+    view = _role_view(ARRAY, [_column_selection([5, 6]), _column_selection([0, 1])])
+    np.testing.assert_array_equal(view, ARRAY[:, [5, 6, 0, 1]])
+
+
+def test_empty_selection():
+    assert _role_view(ARRAY, [_column_selection([])]).shape == (4, 0)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import optimize_dtypes
+
+
+def example_frame(n_rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, 100, n_rows)
+    return pd.DataFrame({
+        'start': start,
+        'end': start + rng.integers(-150, 200, n_rows),
+        'count': rng.integers(-1000, 1000, n_rows),
+        'large': rng.integers(0, 100000, n_rows),
+        'flag': rng.integers(0, 2, n_rows).astype(np.uint16),
+    })
+
+
+def test_integers_stay_signed():
+    df = example_frame()
+    optimized, _ = optimize_dtypes(df)
+    assert optimized.dtypes.to_dict() == {
+        'start': np.int8, 'end': np.int16, 'count': np.int16, 'large': np.int32, 'flag': np.uint8,
+    }
+    pd.testing.assert_frame_equal(optimized, df, check_dtype=False)
+    # Differences of non-negative columns go negative instead of wrapping around
+    assert ((optimized.end - optimized.start) == (df.end - df.start)).all()
+    assert (-optimized.start == -df.start).all()
+
+
+def test_unsigned_is_opt_in():
+    df = example_frame()
+    optimized, _ = optimize_dtypes(df, unsigned=True)
+    assert optimized.dtypes.to_dict() == {
+        'start': np.uint8, 'end': np.int16, 'count': np.int16, 'large': np.uint32, 'flag': np.uint8,
+    }
+    pd.testing.assert_frame_equal(optimized, df, check_dtype=False)
+
+
+@pytest.mark.parametrize('unsigned', [False, True])
+def test_integer_bounds(unsigned):
+    df = pd.DataFrame({
+        'int8': [-128, 127], 'int16': [-129, 127], 'uint8': [0, 255], 'uint16': [0, 65535],
+        'int64': [np.iinfo(np.int64).min, 0],
+    })
+    optimized, _ = optimize_dtypes(df, unsigned=unsigned)
+    expected = {'int8': np.int8, 'int16': np.int16, 'uint8': np.uint8 if unsigned else np.int16,
+                'uint16': np.uint16 if unsigned else np.int32, 'int64': np.int64}
+    assert optimized.dtypes.to_dict() == expected
+    pd.testing.assert_frame_equal(optimized, df, check_dtype=False)
@@ -0,0 +1,21 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import load_dataset
+
+NAME = 'compas-scores-two-years'
+
+
+def test_concurrent_loads_share_the_cache(data_dir, tmp_path):
+    shutil.copytree(os.path.join(data_dir, NAME), tmp_path / NAME)
+    expected = load_dataset(NAME, data_dir=str(tmp_path), use_cache=False)
+
+    # Processes writing the cache at the same time each use their own temporary file
+    with ProcessPoolExecutor(4) as executor:
+        frames = list(executor.map(load_dataset, [NAME] * 4, ['raw'] * 4, [str(tmp_path)] * 4))
+    for df in frames + [load_dataset(NAME, data_dir=str(tmp_path))]:
+        pd.testing.assert_frame_equal(df, expected)
+    assert not [file_name for file_name in os.listdir(tmp_path / NAME / '.cache') if file_name.endswith('.tmp')]
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import map_icd9_category, map_icd9_category_series
+
+
+MALFORMED_CODES = ['', ' ', 'abc', '25x', '1.2.3', '+12', '-3', ' 42 ', '1_000', '4_2', '250.', '.5', 'V', '12 3']
+DECIMAL_CODES = ['250.01', '250.5', '428.0', '996.81', '0.5', '139.9', '140.1', '999.99', '1000.1']
+V_E_CODES = ['V45', 'V57.1', 'E812', 'E849.0', 'v45', 'e812']
+
+
+def assert_same_mapping(codes):
+    expected = [map_icd9_category(code) for code in codes]
+    mapped = map_icd9_category_series(codes)
+    assert mapped.index.equals(codes.index)
+    assert mapped.astype(object).tolist() == expected
+
+
+@pytest.mark.parametrize('dtype', [np.int64, str, object])
+def test_integer_codes(dtype):
+    codes = pd.Series(np.arange(-5, 1100))
+    assert_same_mapping(codes.astype(dtype))
+
+
+def test_float_codes():
+    assert_same_mapping(pd.Series([1.0, 139.5, 250.0, 250.75, 999.9, -1.5, np.nan]))
+
+
+@pytest.mark.parametrize('dtype', [str, object])
+def test_string_codes(dtype):
+    codes = DECIMAL_CODES + V_E_CODES + MALFORMED_CODES + ['?', '250', '780']
+    assert_same_mapping(pd.Series(codes, dtype=dtype))
+
+
+def test_missing_values():
+    assert_same_mapping(pd.Series(['?', np.nan, None, '250', '?'], dtype=object))
+    assert_same_mapping(pd.Series([np.nan, np.nan]))
+
+
+def test_mixed_codes():
+    codes = pd.Series([250, '250.01', 'V45', np.nan, '?', 'abc', 12.5, -3], index=np.arange(8)[::-1], dtype=object)
+    assert_same_mapping(codes)
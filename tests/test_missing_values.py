@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import MISSING_VALUE_SENTINELS, calculate_nan_percentage_of_grouped_features, profile_missing_values
+
+DTYPES = ['str', object, pd.StringDtype('python'), pd.StringDtype('pyarrow'), 'category']
+
+
+def example_frame(text_dtype, n_rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    levels = np.array(['No', 'Steady', '?', 'Unknown/Invalid', 'N/A', None, 'Up'], dtype=object)
+    floats = rng.random(n_rows)
+    floats[rng.random(n_rows) < 0.1] = np.nan
+    df = pd.DataFrame({
+        'text': levels[rng.integers(0, len(levels), n_rows)],
+        'no_sentinels': rng.choice(['a', 'b'], n_rows),
+        'float': floats,
+        'float32': floats.astype(np.float32),
+        'integer': rng.integers(0, 100, n_rows),
+        'nullable': pd.array(rng.integers(0, 100, n_rows), dtype='Int64'),
+        'boolean': rng.random(n_rows) < 0.5,
+    })
+    df.loc[::5, 'nullable'] = pd.NA
+    return df.astype({'text': text_dtype, 'no_sentinels': text_dtype})
+
+
+def reference_counts(df, sentinels):
+    # Null values of every column, sentinels of text and categorical columns
+    null_counts = df.isna().sum()
+    sentinel_counts = pd.Series({
+        column: int(df[column].isin(sentinels).sum())
+        if pd.api.types.is_string_dtype(df[column].dtype) or isinstance(df[column].dtype, pd.CategoricalDtype)
+        else 0
+        for column in df.columns
+    })
+    return null_counts, sentinel_counts
+
+
+@pytest.mark.parametrize('text_dtype', DTYPES)
+@pytest.mark.parametrize('sentinels', [MISSING_VALUE_SENTINELS, ['?'], []])
+def test_counts(text_dtype, sentinels):
+    df = example_frame(text_dtype)
+    original = df.copy(deep=True)
+    profile = profile_missing_values(df, sentinels)
+
+    null_counts, sentinel_counts = reference_counts(df, sentinels)
+    assert profile['Feature'].tolist() == df.columns.tolist()
+    assert profile['Null_Count'].tolist() == null_counts.tolist()
+    assert profile['Sentinel_Count'].tolist() == sentinel_counts.tolist()
+    assert profile['Missing_Count'].tolist() == (null_counts + sentinel_counts).tolist()
+    np.testing.assert_allclose(profile['Missing_Percentage'], (null_counts + sentinel_counts) / len(df) * 100)
+    # The dataframe is neither modified nor converted
+    pd.testing.assert_frame_equal(df, original)
+
+
+@pytest.mark.parametrize('text_dtype', DTYPES)
+def test_counts_match_replacing_sentinels(text_dtype):
+    # The notebooks replaced '?' with pd.NA in place before counting null values
+    df = example_frame(text_dtype)
+    profile = profile_missing_values(df, ['?'])
+    replaced = df.astype({'text': object, 'no_sentinels': object}).replace('?', pd.NA)
+    assert profile['Missing_Count'].tolist() == replaced.isna().sum().tolist()
+
+
+def test_empty_frame():
+    profile = profile_missing_values(example_frame(object).iloc[:0])
+    assert (profile['Missing_Count'] == 0).all()
+    assert profile['Missing_Percentage'].isna().all()
+
+
+def test_grouped_features_do_not_modify_the_frame():
+    df = example_frame(object)
+    original = df.copy(deep=True)
+    yaml_string = """
+dataset:
+  fairness:
+    sensitive: {num: 1, features: [text]}
+    treatment: {num: 2, features: [float, integer]}
+"""
+    missing_stats = calculate_nan_percentage_of_grouped_features(df, yaml_string=yaml_string)
+    pd.testing.assert_frame_equal(df, original)
+    assert missing_stats.set_index('Feature')['Missing_Count'].to_dict() == {
+        'text': int(df['text'].isna().sum() + (df['text'] == '?').sum()),
+        'float': int(df['float'].isna().sum()),
+        'integer': 0,
+    }
@@ -0,0 +1,85 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import expand_encoded_features, maintain_order_columns, one_hot_encode
+
+
+def example_frame(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.integers(18, 90, n_rows),
+        'gender': rng.choice(['Female', 'Male'], n_rows),
+        'race': rng.choice(['Caucasian', 'AfricanAmerican', 'Other', None], n_rows),
+        'score': rng.random(n_rows),
+        'admission_type_id': rng.integers(1, 5, n_rows),
+        'insulin': pd.Categorical(rng.choice(['No', 'Up', 'Down'], n_rows), categories=['Up', 'No', 'Down', 'Steady']),
+        'change': rng.choice(['Ch', 'No'], n_rows),
+    })
+
+
+CATEGORICAL_FEATURES = ['gender', 'race', 'admission_type_id', 'insulin', 'change']
+DROP = ['gender_Female', 'change_Ch']
+
+
+def notebook_encoding(df, categorical_features, drop):
+    # One-hot encoding of the notebooks: get_dummies, then maintain_order_columns
+    original_order = df.columns.tolist()
+    encoded = pd.get_dummies(df, columns=categorical_features, dtype=int)
+    return maintain_order_columns(encoded, original_order, categorical_features).drop(columns=drop)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_matches_get_dummies(sparse):
+    df = example_frame()
+    expected = notebook_encoding(df, CATEGORICAL_FEATURES, DROP)
+    encoded, dummy_columns = one_hot_encode(df, CATEGORICAL_FEATURES, sparse=sparse, drop=DROP)
+
+    assert list(encoded.columns) == list(expected.columns)
+    indicators = [column for columns in dummy_columns.values() for column in columns]
+    expected_dtype = pd.SparseDtype(np.uint8, 0) if sparse else np.uint8
+    assert all(encoded[column].dtype == expected_dtype for column in indicators)
+    dense = encoded.astype({column: np.uint8 for column in indicators}) if sparse else encoded
+    pd.testing.assert_frame_equal(dense, expected, check_dtype=False)
+    assert all(dense[column].dtype == df[column].dtype for column in df.columns if column not in dummy_columns)
+
+
+def test_dummy_columns_match_get_dummies():
+    df = example_frame()
+    expected = notebook_encoding(df, CATEGORICAL_FEATURES, DROP)
+    _, dummy_columns = one_hot_encode(df, CATEGORICAL_FEATURES, drop=DROP)
+
+    assert list(dummy_columns) == CATEGORICAL_FEATURES
+    for feature, columns in dummy_columns.items():
+        # get_dummies names the indicator columns '<feature>_<value>'
+        assert columns == [column for column in expected.columns if column.startswith(f'{feature}_')]
+    assert dummy_columns['gender'] == ['gender_Male']
+    assert dummy_columns['insulin'] == ['insulin_Up', 'insulin_No', 'insulin_Down', 'insulin_Steady']
+    assert expand_encoded_features(['age', 'gender', 'race', 'score'], dummy_columns, expected.columns) == \
+        ['age', 'gender_Male', 'race_AfricanAmerican', 'race_Caucasian', 'race_Other', 'score']
+
+
+def test_missing_values_have_no_indicator():
+    df = example_frame()
+    encoded, dummy_columns = one_hot_encode(df, ['race'])
+    assert (encoded[dummy_columns['race']].sum(axis=1) == df['race'].notna()).all()
+
+
+@pytest.mark.parametrize('dtype', [object, 'category'])
+def test_given_categories(dtype):
+    # Values that are not among the categories (e.g. of new data) get no indicator
+    df = pd.DataFrame({'race': pd.Series(['Other', 'Asian', None, 'Caucasian', 'Asian'], dtype=dtype)})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        encoded, dummy_columns = one_hot_encode(df, ['race'], categories={'race': ['Caucasian', 'Hispanic', 'Other']})
+    assert dummy_columns['race'] == ['race_Caucasian', 'race_Hispanic', 'race_Other']
+    assert encoded.to_numpy().tolist() == [[0, 0, 1], [0, 0, 0], [0, 0, 0], [1, 0, 0], [0, 0, 0]]
+
+
+def test_without_categorical_features():
+    df = example_frame()
+    encoded, dummy_columns = one_hot_encode(df, [])
+    pd.testing.assert_frame_equal(encoded, df)
+    assert dummy_columns == {}
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import (
+    get_categorical_features,
+    get_numerical_features,
+    get_treatment_features,
+    maintain_order_columns,
+    map_icd9_category,
+    order_columns,
+)
+
+from treatment_datasets.pipeline import Pipeline, load_pipeline, minmax_scale
+
+sklearn_preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+
+def notebook_diabetes(data_dir):
+    # Preprocessing of diabetes.ipynb before the pipeline: get_dummies, maintain_order_columns, MinMaxScaler
+    yaml_path = f'{data_dir}/diabetes/features_raw.yaml'
+    df = pd.read_csv(f'{data_dir}/diabetes/data.csv')
+
+    df_treatment = df[get_treatment_features(yaml_path)]
+    df = df.drop(columns=df_treatment.columns[(df_treatment == 'No').mean() > 0.98])
+    df = df.replace('?', pd.NA)
+    df = df.drop(columns=['weight', 'max_glu_serum', 'A1Cresult', 'encounter_id', 'patient_nbr', 'payer_code'])
+    df = df[df['gender'] != 'Unknown/Invalid']
+    for column in ['diag_1', 'diag_2', 'diag_3']:
+        df[column] = df[column].apply(map_icd9_category)
+    df = df[order_columns(df, yaml_path)]
+
+    original_order = df.columns.tolist()
+    categorical_features = get_categorical_features(df, yaml_path)
+    df = pd.get_dummies(df, columns=categorical_features, dtype=int)
+    df = maintain_order_columns(df, original_order, categorical_features)
+    df = df.drop(columns=['gender_Female', 'change_Ch', 'diabetesMed_No'])
+
+    numerical_features = get_numerical_features(df, yaml_path)
+    df[numerical_features] = sklearn_preprocessing.MinMaxScaler().fit_transform(df[numerical_features])
+    return df
+
+
+def test_diabetes_matches_notebook(data_dir):
+    expected = notebook_diabetes(data_dir)
+    state = load_pipeline('diabetes', data_dir).run()
+    pd.testing.assert_frame_equal(state.df, expected, check_dtype=False)
+    assert all(state.df[column].dtype == np.uint8 for columns in state.dummy_columns.values() for column in columns)
+
+
+def test_build_writes_notebook_csv(data_dir):
+    pipeline = load_pipeline('diabetes', data_dir)
+    _, n_rows = pipeline.build()
+    expected = notebook_diabetes(data_dir)
+    assert n_rows == len(expected)
+    with open(f'{data_dir}/diabetes/data_preprocessed.csv', 'r') as file:
+        assert file.read() == expected.to_csv(index=False)
+
+
+def test_transform_reuses_fitted_statistics(data_dir):
+    pipeline = load_pipeline('diabetes', data_dir)
+    full = pipeline.build()[0].df
+
+    # Rows of the raw data with fewer categories and smaller ranges than the whole data
+    raw = pd.read_csv(f'{data_dir}/diabetes/data.csv')
+    transformed = pipeline.transform(raw.iloc[:40])
+    pd.testing.assert_frame_equal(transformed, full.loc[full.index < 40])
+    assert list(transformed.columns) == list(full.columns)
+
+
+def test_transform_without_build(tmp_path):
+    pipeline = Pipeline('diabetes', [('minmax_scale', {})], data_dir=str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        pipeline.transform(pd.DataFrame({'time_in_hospital': [1, 2]}))
+
+
+@pytest.mark.filterwarnings('ignore:All-NaN slice encountered')
+def test_minmax_scale_matches_sklearn():
+    rng = np.random.default_rng(0)
+    values = np.column_stack([
+        rng.normal(size=200),
+        np.full(200, 3.0),
+        1e6 + rng.integers(0, 3, 200),
+        np.where(rng.random(200) < 0.2, np.nan, rng.random(200)),
+        # Ranges below 10 * eps are treated as constant
+        rng.integers(0, 3, 200) * 1e-16,
+        5.0 + rng.integers(0, 3, 200) * 1e-15,
+        np.full(200, np.nan),
+    ])
+    expected = sklearn_preprocessing.MinMaxScaler().fit_transform(values)
+    np.testing.assert_array_equal(minmax_scale(values), expected)
+
+
+def test_unknown_step():
+    with pytest.raises(ValueError):
+        Pipeline('diabetes', [('standardize', {})])
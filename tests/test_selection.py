@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from treatment_datasets import pipeline as pipeline_module
+from treatment_datasets.pipeline import Pipeline
+
+COMPAS = 'compas-scores-two-years'
+COMPAS_FILTER = {'conditions': [
+    {'column': 'days_b_screening_arrest', 'op': 'between', 'value': [-30, 30]},
+    {'column': 'is_recid', 'op': '!=', 'value': -1},
+    {'column': 'c_charge_degree', 'op': '!=', 'value': 'O'},
+    {'column': 'score_text', 'op': '!=', 'value': 'N/A'},
+    {'column': 'end', 'op': '>', 'other': 'start'},
+]}
+COMPAS_DROPPED = ['priors_count.1', 'decile_score.1', 'screening_date', 'vr_offense_date', 'violent_recid',
+                  'is_violent_recid', 'vr_charge_degree', 'vr_charge_desc', 'v_type_of_assessment', 'v_score_text',
+                  'v_decile_score', 'vr_case_number']
+
+
+def notebook_compas(data_dir):
+    # Row filter and column selection of compas-scores-two-years.ipynb
+    df = pd.read_csv(f'{data_dir}/{COMPAS}/data.csv')
+    df = df[(df['days_b_screening_arrest'] <= 30) &
+            (df['days_b_screening_arrest'] >= -30) &
+            (df['is_recid'] != -1) &
+            (df['c_charge_degree'] != 'O') &
+            (df['score_text'] != 'N/A') &
+            (df.end > df.start)]
+    df = df.drop(columns=COMPAS_DROPPED)
+    return df.dropna(axis=1, thresh=df.shape[0] * 0.2)
+
+
+@pytest.fixture(params=[False, True], ids=['pandas', 'numexpr'])
+def numexpr_calls(request, monkeypatch):
+    # Expressions evaluated by numexpr, None if conditions are evaluated with pandas only
+    if not request.param:
+        monkeypatch.setattr(pipeline_module, 'numexpr', None)
+        return None
+    numexpr = pytest.importorskip('numexpr')
+    calls = []
+    evaluate = numexpr.evaluate
+    monkeypatch.setattr(numexpr, 'evaluate', lambda expression, **kwargs: calls.append(expression) or
+                        evaluate(expression, **kwargs))
+    return calls
+
+
+def test_compas_selection_matches_notebook(data_dir, numexpr_calls):
+    pipeline = Pipeline(COMPAS, [
+        ('filter_rows', COMPAS_FILTER),
+        ('drop_columns', {'columns': COMPAS_DROPPED}),
+        ('drop_missing', {'threshold': 0.8}),
+    ], data_dir=data_dir)
+    state = pipeline.run()
+    expected = notebook_compas(data_dir)
+    pd.testing.assert_frame_equal(state.df, expected)
+    assert numexpr_calls is None or len(numexpr_calls) == 1
+
+    report = state.selection_report
+    raw_columns = pd.read_csv(f'{data_dir}/{COMPAS}/data.csv', nrows=0).columns
+    assert report[0]['rows_removed'] == 7214 - len(expected)
+    assert set(report[1]['columns_removed']) == set(COMPAS_DROPPED)
+    assert set(report[2]['columns_removed']) == set(raw_columns) - set(expected.columns) - set(COMPAS_DROPPED)
+
+
+def test_compas_constant_and_unique_columns(data_dir, numexpr_calls):
+    filtered = notebook_compas(data_dir)
+    n_distinct = filtered.nunique()
+    constant = set(n_distinct.index[n_distinct <= 1])
+    unique = set(n_distinct.index[(n_distinct > 1) & (n_distinct == filtered.count())])
+    # The columns the notebook drops as constant or as identifiers
+    assert 'type_of_assessment' in constant
+    assert {'id', 'c_case_number', 'r_case_number'} <= unique
+
+    for drop_unique, dropped in [(False, constant), (True, constant | unique)]:
+        steps = [
+            ('filter_rows', COMPAS_FILTER),
+            ('drop_columns', {'columns': COMPAS_DROPPED}),
+            ('drop_missing', {'threshold': 0.8}),
+            ('drop_constant', {'unique': drop_unique}),
+        ]
+        df = Pipeline(COMPAS, steps, data_dir=data_dir).run().df
+        assert list(df.columns) == [column for column in filtered.columns if column not in dropped]
+
+
+@pytest.mark.parametrize('dtype', [np.int8, np.uint16, np.int64, np.float32, np.float64])
+def test_filter_rows_conditions(data_dir, numexpr_calls, dtype):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'x': rng.integers(0 if dtype == np.uint16 else -50, 50, 500).astype(dtype),
+        'y': rng.integers(-50, 50, 500).astype(np.int64 if dtype == np.uint16 else dtype),
+        'label': rng.choice(['a', 'b', 'c'], 500),
+    })
+    if dtype in (np.float32, np.float64):
+        df.loc[::7, 'x'] = np.nan
+    conditions = [
+        {'column': 'x', 'op': 'between', 'value': [-10, 30]},
+        {'column': 'y', 'op': '<', 'other': 'x'},
+        {'column': 'label', 'op': 'not in', 'value': ['c']},
+        {'column': 'x', 'op': '!=', 'value': 3},
+    ]
+    expected = df[(df.x >= -10) & (df.x <= 30) & (df.y < df.x) & ~df.label.isin(['c']) & (df.x != 3)]
+    pipeline = Pipeline(COMPAS, [('filter_rows', {'conditions': conditions})], data_dir=data_dir)
+    pd.testing.assert_frame_equal(pipeline.run(df).df, expected)
+    # The comparisons of numerical columns are evaluated in one expression
+    assert numexpr_calls is None or len(numexpr_calls) == 1
@@ -0,0 +1,175 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from treatment_datasets.stats import (
+    CountStatistics,
+    DistinctStatistics,
+    MinMaxStatistics,
+    ValueCountsStatistics,
+    ValueFractionStatistics,
+    merge_step_statistics,
+    statistics_from_dict,
+)
+
+
+def example_frame(n_rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'integer': rng.integers(-50, 50, n_rows),
+        'float': np.where(rng.random(n_rows) < 0.1, np.nan, rng.normal(size=n_rows)),
+        'text': rng.choice(['No', 'Steady', 'Up', None], n_rows, p=[0.7, 0.1, 0.1, 0.1]),
+        'category': pd.Categorical(rng.choice(['a', 'b', 'c'], n_rows), categories=['c', 'b', 'a', 'unused']),
+        'flag': rng.integers(0, 2, n_rows).astype(np.uint8),
+    })
+    df.loc[:400, 'float'] = np.nan
+    return df
+
+
+ACCUMULATORS = {
+    'min_max': (MinMaxStatistics, lambda df: df[['integer', 'float', 'flag']]),
+    'count': (CountStatistics, lambda df: df),
+    'value_counts': (ValueCountsStatistics, lambda df: df[['integer', 'text', 'category', 'flag']]),
+    'value_fraction': (lambda: ValueFractionStatistics('No'), lambda df: df[['text', 'category']]),
+}
+
+
+def as_json(statistics):
+    # Comparable content of an accumulator, missing minima and maxima (NaN) included
+    return json.dumps(statistics.to_dict(), sort_keys=True, default=str)
+
+
+def split(df, boundaries):
+    starts = [0] + list(boundaries)
+    stops = list(boundaries) + [len(df)]
+    return [df.iloc[start:stop] for start, stop in zip(starts, stops)]
+
+
+@pytest.mark.parametrize('accumulator', ACCUMULATORS)
+@pytest.mark.parametrize('boundaries', [[500], [1, 400, 401, 999], [0, 1000]])
+def test_merged_chunks_match_full_frame(accumulator, boundaries):
+    create, select = ACCUMULATORS[accumulator]
+    df = select(example_frame())
+    expected = as_json(create().update(df))
+
+    updated = create()
+    merged = create()
+    for chunk in split(df, boundaries):
+        updated.update(chunk)
+        merged.merge(create().update(chunk))
+    assert as_json(updated) == expected
+    assert as_json(merged) == expected
+
+
+@pytest.mark.parametrize('accumulator', ACCUMULATORS)
+def test_round_trip(accumulator):
+    create, select = ACCUMULATORS[accumulator]
+    first, second = split(select(example_frame()), [300])
+    statistics = create().update(first)
+    loaded = statistics_from_dict(statistics.to_dict())
+    assert as_json(loaded) == as_json(statistics)
+
+    # Loaded statistics can be merged with statistics of the rest of the data
+    expected = as_json(create().update(first).update(second))
+    assert as_json(loaded.merge(create().update(second))) == expected
+    assert as_json(create().update(second).merge(statistics_from_dict(statistics.to_dict()))) == expected
+
+
+def test_round_trip_of_distinct_values():
+    for unique in (False, True):
+        statistics = DistinctStatistics(unique).update(example_frame())
+        loaded = statistics_from_dict(statistics.to_dict())
+        assert as_json(loaded) == as_json(statistics)
+        assert loaded.constant() == statistics.constant()
+        if unique:
+            assert loaded.unique() == statistics.unique()
+
+
+def test_merge_step_statistics():
+    first, second = split(example_frame(), [600])
+    step_statistics = {0: CountStatistics().update(first), 2: MinMaxStatistics().update(first[['float']])}
+    other = {2: MinMaxStatistics().update(second[['float']]), 3: ValueCountsStatistics().update(second[['text']])}
+    merged = merge_step_statistics(step_statistics, other)
+    assert sorted(merged) == [0, 2, 3]
+    assert merged[2].to_dict() == MinMaxStatistics().update(example_frame()[['float']]).to_dict()
+
+
+def test_value_fractions_of_different_values_are_not_merged():
+    with pytest.raises(ValueError):
+        ValueFractionStatistics('No').merge(ValueFractionStatistics('Yes'))
+
+
+def test_unknown_statistics_type():
+    with pytest.raises(ValueError):
+        statistics_from_dict({'type': 'median'})
+
+
+def distinct_frame(n_rows=1000, seed=1):
+    rng = np.random.default_rng(seed)
+    late_duplicate = np.arange(n_rows, dtype=np.float64)
+    late_duplicate[700] = late_duplicate[10]
+    return pd.DataFrame({
+        'constant': np.full(n_rows, 'Risk of Recidivism', dtype=object),
+        'constant_with_missing': np.where(rng.random(n_rows) < 0.5, np.nan, 2.0),
+        'missing': np.full(n_rows, np.nan),
+        'identifier': rng.permutation(n_rows),
+        'identifier_with_missing': np.where(rng.random(n_rows) < 0.3, np.nan, np.arange(n_rows)),
+        'late_duplicate': late_duplicate,
+        # Constant until row 650, in the middle of a chunk
+        'late_second_value': np.where(np.arange(n_rows) < 650, 'a', 'b'),
+        'categories': pd.Categorical(rng.choice(['x', 'y'], n_rows)),
+        'single_category': pd.Categorical(np.full(n_rows, 'x'), categories=['x', 'unused']),
+        'boolean': rng.random(n_rows) < 0.5,
+    })
+
+
+def expected_distinct(df):
+    n_distinct = df.nunique()
+    constant = sorted(n_distinct.index[n_distinct <= 1])
+    unique = sorted(n_distinct.index[(n_distinct > 1) & (n_distinct == df.count())])
+    return constant, unique
+
+
+@pytest.mark.parametrize('unique', [False, True])
+@pytest.mark.parametrize('boundaries', [[], [500], [10, 11, 600, 700, 701], list(range(50, 1000, 50))])
+def test_distinct_values_match_nunique(unique, boundaries):
+    df = distinct_frame()
+    expected_constant, expected_unique = expected_distinct(df)
+
+    updated = DistinctStatistics(unique)
+    merged = DistinctStatistics(unique)
+    merged_reversed = DistinctStatistics(unique)
+    chunks = split(df, boundaries)
+    for chunk in chunks:
+        updated.update(chunk)
+        merged.merge(DistinctStatistics(unique).update(chunk))
+    for chunk in chunks[::-1]:
+        merged_reversed.merge(DistinctStatistics(unique).update(chunk))
+
+    for statistics in (updated, merged, merged_reversed):
+        assert sorted(statistics.constant()) == expected_constant
+        assert statistics.n_values == df.count().to_dict()
+        if unique:
+            assert sorted(statistics.unique()) == expected_unique
+        else:
+            with pytest.raises(ValueError):
+                statistics.unique()
+
+
+def test_distinct_values_keep_few_values_without_unique():
+    statistics = DistinctStatistics().update(distinct_frame())
+    assert all(len(values) <= 1 for values in statistics._values.values())
+    assert statistics.n_distinct['identifier'] is None
+
+
+def test_loaded_distinct_values_cannot_be_updated():
+    df = distinct_frame()
+    loaded = statistics_from_dict(DistinctStatistics().update(df.iloc[:500]).to_dict())
+    with pytest.raises(ValueError):
+        loaded.update(df.iloc[500:])
+    with pytest.raises(ValueError):
+        DistinctStatistics().merge(loaded)
+    with pytest.raises(ValueError):
+        DistinctStatistics(unique=True).merge(DistinctStatistics())
@@ -0,0 +1,48 @@
+import pytest
+
+from treatment_datasets.pipeline import load_pipeline
+from treatment_datasets.writer import write_csv
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('name', ['diabetes', 'mimic-III-sepsis'])
+@pytest.mark.parametrize('chunksize', [500, 1237, 100_000])
+def test_streaming_matches_in_memory(data_dir, tmp_path, name, chunksize):
+    pipeline = load_pipeline(name, data_dir)
+    state = pipeline.run()
+    write_csv(state.df, tmp_path / 'in_memory.csv', pipeline.float_precision)
+
+    streamed, output_statistics = pipeline.run_streaming(tmp_path / 'streamed.csv', chunksize)
+    assert read_bytes(tmp_path / 'streamed.csv') == read_bytes(tmp_path / 'in_memory.csv')
+    assert output_statistics.n_rows == len(state.df)
+    assert streamed.dummy_columns == state.dummy_columns
+    assert {step_id: statistics.to_dict() for step_id, statistics in streamed.statistics.items()} == \
+        {step_id: statistics.to_dict() for step_id, statistics in state.statistics.items()}
+
+
+def test_streaming_with_column_workers(data_dir, tmp_path):
+    pipeline = load_pipeline('diabetes', data_dir)
+    write_csv(pipeline.run().df, tmp_path / 'in_memory.csv', pipeline.float_precision)
+
+    pipeline = load_pipeline('diabetes', data_dir, column_workers=2)
+    pipeline.run_streaming(tmp_path / 'streamed.csv', 700)
+    assert read_bytes(tmp_path / 'streamed.csv') == read_bytes(tmp_path / 'in_memory.csv')
+
+
+def test_streaming_fits_stages_on_transformed_chunks(data_dir, tmp_path):
+    # Stateful steps after one_hot_encode see the indicator columns of the fitted vocabulary
+    pipeline = load_pipeline('diabetes', data_dir)
+    pipeline.steps = pipeline.steps + [
+        ('drop_dominant_value', {'features': ['race_Asian', 'race_Other', 'admission_type_id_1'],
+                                 'value': 0, 'threshold': 0.8}),
+        ('drop_constant', {}),
+    ]
+    expected = pipeline.run().df
+    write_csv(expected, tmp_path / 'in_memory.csv', pipeline.float_precision)
+
+    pipeline.run_streaming(tmp_path / 'streamed.csv', 400)
+    assert read_bytes(tmp_path / 'streamed.csv') == read_bytes(tmp_path / 'in_memory.csv')
@@ -0,0 +1,100 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from treatment_datasets.writer import CsvWriter, format_csv, write_csv
+
+
+def numerical_frame(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'race_A': rng.integers(0, 2, n_rows).astype(np.uint8),
+        'race_B': rng.integers(0, 2, n_rows).astype(np.uint8),
+        'score': rng.integers(0, 10, n_rows),
+        'scaled': np.where(rng.random(n_rows) < 0.1, np.nan, rng.random(n_rows)),
+        'count': rng.integers(-1000, 1000, n_rows),
+        'small': (rng.normal(size=n_rows) * 1e-7).astype(np.float32),
+        'large': rng.normal(size=n_rows) * 1e17,
+        'flag': rng.random(n_rows) < 0.5,
+        'age_0': rng.integers(0, 2, n_rows).astype(np.int8),
+        'age_1': rng.integers(0, 2, n_rows).astype(np.int64),
+    })
+
+
+def to_csv(df, float_precision=None):
+    if float_precision is not None:
+        df = df.round(float_precision)
+    return df.to_csv(index=False, lineterminator=os.linesep).encode()
+
+
+@pytest.mark.parametrize('columns', [
+    None,
+    ['race_A', 'race_B', 'age_0', 'age_1'],
+    ['scaled', 'race_A', 'race_B'],
+    ['race_A', 'scaled'],
+    ['small', 'scaled', 'large'],
+    ['count', 'flag'],
+])
+def test_format_csv_matches_to_csv(columns):
+    df = numerical_frame()
+    if columns is not None:
+        df = df[columns]
+    assert format_csv(df) == to_csv(df)
+    assert format_csv(df, header=False) == df.to_csv(index=False, header=False, lineterminator=os.linesep).encode()
+
+
+@pytest.mark.parametrize('float_precision', [0, 3, 6])
+def test_format_csv_with_float_precision(float_precision):
+    df = numerical_frame()
+    assert format_csv(df, float_precision=float_precision) == to_csv(df, float_precision)
+
+
+def test_format_csv_of_special_floats():
+    df = pd.DataFrame({
+        'x': [0.0, -0.0, 1.0, 1e16, 1e-5, 123456789.125, np.inf, -np.inf, np.nan, 0.1 + 0.2],
+        'y': np.arange(10, dtype=np.float32) / 3,
+    })
+    assert format_csv(df) == to_csv(df)
+
+
+def test_format_csv_of_single_column():
+    df = pd.DataFrame({'x': [1.5, np.nan, 2.0]})
+    assert format_csv(df) == to_csv(df)
+    df = pd.DataFrame({'x': np.array([1, 0, 1], dtype=np.uint8)})
+    assert format_csv(df) == to_csv(df)
+
+
+def test_format_csv_of_empty_frames():
+    df = numerical_frame().iloc[:0]
+    assert format_csv(df) == to_csv(df)
+    assert format_csv(df, header=False) == b''
+    assert format_csv(pd.DataFrame()) == to_csv(pd.DataFrame())
+
+
+def test_format_csv_of_other_dtypes():
+    df = pd.DataFrame({'x': [1.5, 2.0], 'label': ['a', None], 'category': pd.Categorical(['b', 'c'])})
+    assert format_csv(df) == to_csv(df)
+
+
+def test_chunked_writes_match_to_csv(tmp_path):
+    df = numerical_frame(1000)
+    with CsvWriter(tmp_path / 'chunked.csv', chunksize=77) as writer:
+        writer.write(df.iloc[:500])
+        writer.write(df.iloc[500:])
+    with open(tmp_path / 'chunked.csv', 'rb') as file:
+        assert file.read() == to_csv(df)
+    assert writer.n_rows == len(df)
+
+    # Chunks formatted in parallel are written in order
+    with ThreadPoolExecutor(3) as executor:
+        write_csv(df, tmp_path / 'parallel.csv', chunksize=50, executor=executor)
+    with open(tmp_path / 'parallel.csv', 'rb') as file:
+        assert file.read() == to_csv(df)
+
+    write_csv(df, tmp_path / 'compressed.csv.gz', float_precision=4, chunksize=300)
+    with gzip.open(tmp_path / 'compressed.csv.gz', 'rb') as file:
+        assert file.read() == to_csv(df, 4)
@@ -0,0 +1,16 @@
+from .arrays import export_arrays, load_array_metadata, load_arrays
+from .cache import StepCache
+from .catalog import build_catalog, find_datasets, load_catalog
+from .dataset import Dataset
+from .stats import (
+    CountStatistics,
+    DistinctStatistics,
+    MinMaxStatistics,
+    ValueCountsStatistics,
+    ValueFractionStatistics,
+    load_step_statistics,
+    merge_step_statistics,
+    save_step_statistics,
+)
+from .pipeline import Pipeline, PipelineState, list_pipelines, load_pipeline, minmax_scale
+from .writer import CsvWriter, export_csv, format_csv, write_csv
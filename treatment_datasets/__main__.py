@@ -0,0 +1,220 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from utils import DATA_DIR, get_dataset_paths, load_dataset, load_feature_schema
+
+from .arrays import export_arrays
+from .cache import DEFAULT_MAX_BYTES, StepCache
+from .catalog import build_catalog, catalog_columns, find_datasets, load_catalog
+from .parallel import build_datasets
+from .pipeline import list_pipelines
+from .synthetic import PROFILE_FILE, profile_dataset, save_profile, synthesize_dataset
+from .trace import save_chrome_trace, save_trace
+from .writer import export_csv
+
+
+def get_cache(args):
+    return StepCache(os.path.join(args.data_dir, '.cache', 'pipeline'), int(args.cache_size * 1024 ** 2))
+
+
+def print_result(result):
+    if 'error' in result:
+        print(f"{result['name']}: failed: {type(result['error']).__name__}: {result['error']}", file=sys.stderr)
+        return
+    streaming = f", chunks of {result['chunksize']} rows" if result['chunksize'] else ''
+    print(f"{result['name']}: {result['rows']} rows, {result['columns']} columns "
+          f"({result['seconds']:.2f}s{streaming})")
+
+
+def build(args):
+    cache = None if args.no_cache else get_cache(args)
+    names = args.datasets or list_pipelines(args.data_dir)
+    memory_budget = int(args.memory_budget * 1024 ** 2) if args.memory_budget else None
+    start = time.perf_counter()
+    results = build_datasets(names, args.data_dir, max_workers=args.jobs, cache=cache, chunksize=args.chunksize,
+                             memory_budget=memory_budget, column_workers=args.column_workers,
+                             arrays=args.arrays, tracing=bool(args.trace or args.chrome_trace),
+                             trace_allocations=args.trace_allocations, callback=print_result)
+    print(f"Built {len(names)} datasets in {time.perf_counter() - start:.2f}s")
+
+    traces = {result['name']: result['trace'] for result in results if 'trace' in result}
+    if args.trace:
+        save_trace(args.trace, traces)
+    if args.chrome_trace:
+        save_chrome_trace(args.chrome_trace, traces)
+    n_warnings = sum(len(trace['warnings']) for trace in traces.values())
+    if n_warnings:
+        print(f"{n_warnings} warnings written to the trace")
+    return 1 if any('error' in result for result in results) else 0
+
+
+def export(args):
+    for name in args.datasets:
+        shape = export_arrays(name, args.data_dir)
+        print(f"{name}: array of {shape[0]} rows and {shape[1]} columns")
+
+
+def export_compressed(args):
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.jobs) if args.jobs > 1 else nullcontext() as executor:
+        n_rows = export_csv(args.dataset, args.output, args.data_dir, args.float_precision,
+                            compression_level=args.compression_level, chunksize=args.chunksize, executor=executor)
+    print(f"{args.dataset}: {n_rows} rows in {args.output} ({time.perf_counter() - start:.2f}s)")
+
+
+def profile(args):
+    for name in args.datasets:
+        _, yaml_path = get_dataset_paths(name, 'raw', args.data_dir)
+        schema = load_feature_schema(yaml_path) if yaml_path is not None else None
+        path = os.path.join(args.data_dir, name, PROFILE_FILE)
+        save_profile(path, profile_dataset(load_dataset(name, 'raw', args.data_dir, apply_dtypes=False), schema))
+        print(f"{name}: {path}")
+
+
+def synthesize(args):
+    for name in args.datasets:
+        start = time.perf_counter()
+        n_rows = synthesize_dataset(name, args.rows, args.output_dir, args.data_dir, seed=args.seed,
+                                    chunksize=args.chunksize, max_workers=args.jobs)
+        print(f"{name}: {n_rows} rows in {os.path.join(args.output_dir, name)} ({time.perf_counter() - start:.2f}s)")
+
+
+def catalog_build(args):
+    catalog, updated = build_catalog(args.data_dir, args.path, rebuild=args.rebuild)
+    print(f"{len(catalog['datasets'])} datasets, summarized: {', '.join(updated) or 'none'}")
+
+
+def catalog_query(args):
+    catalog = load_catalog(args.path, args.data_dir)
+    role_features = {role: getattr(args, role) for role in ('sensitive', 'covariate', 'treatment', 'target')
+                     if getattr(args, role)}
+    for name in find_datasets(catalog, min_samples=args.min_samples, binary_treatment=args.binary_treatment,
+                              max_missing_rate=args.max_missing_rate, **role_features):
+        print(f"{name}: {catalog['datasets'][name]['n_samples']} samples")
+
+
+def catalog_show(args):
+    catalog = load_catalog(args.path, args.data_dir)
+    if args.dataset not in catalog['datasets']:
+        print(f"Dataset '{args.dataset}' is not in the catalog, run 'catalog build' first", file=sys.stderr)
+        return 1
+    entry = catalog['datasets'][args.dataset]
+    print(f"{args.dataset}: {entry['n_samples']} samples")
+    for role, features in entry['roles'].items():
+        print(f"  {role}: {', '.join(map(str, features))}")
+    for feature, fractions in (entry.get('treatment_prevalence') or {}).items():
+        print(f"  prevalence of {feature}: " + ', '.join(f"{value} {fraction:.1%}" for value, fraction in fractions.items()))
+    if entry.get('columns'):
+        print(catalog_columns(catalog, args.dataset).to_string())
+
+
+def evict_cache(args):
+    cache = get_cache(args)
+    if args.clear:
+        removed, freed = cache.clear()
+    else:
+        removed, freed = cache.evict()
+    print(f"Removed {removed} cache entries ({freed / 1024 ** 2:.1f} MB), {cache.size() / 1024 ** 2:.1f} MB left")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m treatment_datasets')
+    parser.add_argument('--data-dir', default=DATA_DIR, help="directory containing the dataset folders")
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="size limit of the pipeline step cache in MB")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser(
+        'build', help="write data_preprocessed.csv and features_preprocessed.yaml from data/<dataset>/pipeline.yaml")
+    build_parser.add_argument('datasets', nargs='*', help="datasets to build (default: all datasets with a pipeline)")
+    build_parser.add_argument('--no-cache', action='store_true', help="do not read or write cached step results")
+    build_parser.add_argument('--chunksize', type=int, default=None,
+                              help="process the raw csv file in chunks of this many rows (streaming build)")
+    build_parser.add_argument('-j', '--jobs', type=int, default=None,
+                              help="number of datasets built in parallel (default: number of CPUs)")
+    build_parser.add_argument('--memory-budget', type=float, default=None,
+                              help="estimated memory per dataset in MB above which it is streamed in chunks")
+    build_parser.add_argument('--column-workers', type=int, default=1,
+                              help="number of processes per dataset for steps that process columns independently")
+    build_parser.add_argument('--arrays', action='store_true',
+                              help="also write data_preprocessed.npy (see export-arrays)")
+    build_parser.add_argument('--trace', metavar='PATH', default=None,
+                              help="write the time, memory and shapes of each step and the warnings to a json file")
+    build_parser.add_argument('--chrome-trace', metavar='PATH', default=None,
+                              help="write the trace in Chrome trace format (chrome://tracing, Perfetto, speedscope)")
+    build_parser.add_argument('--trace-allocations', action='store_true',
+                              help="also measure the memory allocated by each step (slow)")
+    build_parser.set_defaults(func=build)
+
+    export_parser = subparsers.add_parser(
+        'export-arrays', help="write data_preprocessed.csv as float32 array data_preprocessed.npy to be memory-mapped")
+    export_parser.add_argument('datasets', nargs='+', help="datasets to export")
+    export_parser.set_defaults(func=export)
+
+    export_csv_parser = subparsers.add_parser(
+        'export-csv', help="write data_preprocessed.csv with fewer decimals or compressed (.gz, .zst)")
+    export_csv_parser.add_argument('dataset', help="dataset to export")
+    export_csv_parser.add_argument('output', help="path of the csv file, compressed if it ends with .gz or .zst")
+    export_csv_parser.add_argument('--float-precision', type=int, default=None,
+                                   help="number of decimals of the floats (default: all)")
+    export_csv_parser.add_argument('--compression-level', type=int, default=None,
+                                   help="compression level (default: 9 for gzip, 3 for zstd)")
+    export_csv_parser.add_argument('--chunksize', type=int, default=100_000, help="number of rows formatted at once")
+    export_csv_parser.add_argument('-j', '--jobs', type=int, default=1, help="number of processes formatting chunks")
+    export_csv_parser.set_defaults(func=export_compressed)
+
+    profile_parser = subparsers.add_parser(
+        'profile', help="write the column statistics of the raw data used by synthesize to data/<dataset>/profile.yaml")
+    profile_parser.add_argument('datasets', nargs='+', help="datasets to profile")
+    profile_parser.set_defaults(func=profile)
+
+    synthesize_parser = subparsers.add_parser(
+        'synthesize', help="generate synthetic raw data with the column statistics of a dataset")
+    synthesize_parser.add_argument('datasets', nargs='+', help="datasets to imitate")
+    synthesize_parser.add_argument('--rows', type=int, required=True, help="number of rows to generate")
+    synthesize_parser.add_argument('--output-dir', required=True,
+                                   help="directory in which a folder is created for each dataset")
+    synthesize_parser.add_argument('--seed', type=int, default=0, help="seed of the random generator")
+    synthesize_parser.add_argument('--chunksize', type=int, default=100_000, help="number of rows generated at once")
+    synthesize_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                                   help="number of processes generating chunks (default: number of CPUs)")
+    synthesize_parser.set_defaults(func=synthesize)
+
+    catalog_parser = subparsers.add_parser(
+        'catalog', help="index the roles and column statistics of all datasets and query the index")
+    catalog_parser.add_argument('--path', default=None,
+                                help="json file of the catalog (default: <data-dir>/.cache/catalog.json)")
+    catalog_subparsers = catalog_parser.add_subparsers(dest='catalog_command', required=True)
+    catalog_build_parser = catalog_subparsers.add_parser(
+        'build', help="summarize the datasets whose raw data or feature YAML changed")
+    catalog_build_parser.add_argument('--rebuild', action='store_true', help="summarize all datasets again")
+    catalog_build_parser.set_defaults(func=catalog_build)
+    catalog_query_parser = catalog_subparsers.add_parser('query', help="list the datasets matching all conditions")
+    for role in ('sensitive', 'covariate', 'treatment', 'target'):
+        catalog_query_parser.add_argument(f'--{role}', nargs='+', metavar='FEATURE',
+                                          help=f"features that must be {role} features")
+    catalog_query_parser.add_argument('--min-samples', type=int, default=None, help="smallest number of samples")
+    catalog_query_parser.add_argument('--binary-treatment', action='store_true', default=None,
+                                      help="only datasets whose treatment features have two values")
+    catalog_query_parser.add_argument('--max-missing-rate', type=float, default=None,
+                                      help="largest missing value rate (0 to 1) of the features with a role")
+    catalog_query_parser.set_defaults(func=catalog_query)
+    catalog_show_parser = catalog_subparsers.add_parser('show', help="print the catalog entry of a dataset")
+    catalog_show_parser.add_argument('dataset')
+    catalog_show_parser.set_defaults(func=catalog_show)
+
+    evict_parser = subparsers.add_parser(
+        'evict-cache', help="remove the least recently used step results until the cache fits --cache-size")
+    evict_parser.add_argument('--clear', action='store_true', help="remove all cached step results")
+    evict_parser.set_defaults(func=evict_cache)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import DATA_DIR, FAIRNESS_ROLES, get_dataset_paths, load_feature_schema, warn
+
+
+ARRAY_FILE = 'data_preprocessed.npy'
+ARRAY_METADATA_FILE = 'data_preprocessed.json'
+ARRAY_DTYPE = np.float32
+
+# Roles of the matrices used by treatment effect models: features X, treatment T, target Y
+MODEL_ROLES = {
+    'X': ['sensitive', 'covariate'],
+    'T': ['treatment'],
+    'Y': ['target'],
+}
+
+
+def _array_paths(name, data_dir):
+    dataset_dir = os.path.join(data_dir, name)
+    return os.path.join(dataset_dir, ARRAY_FILE), os.path.join(dataset_dir, ARRAY_METADATA_FILE)
+
+
+def _column_selection(indices):
+    # A range of columns if the indices are consecutive and increasing, the list of indices
+    # otherwise, in their order (the order of the YAML file)
+    indices = list(indices)
+    if indices and indices == list(range(indices[0], indices[0] + len(indices))):
+        return {'start': indices[0], 'stop': indices[-1] + 1}
+    return {'indices': indices}
+
+
+def export_arrays(name, data_dir=DATA_DIR, chunksize=100_000):
+    """
+    Writes data_preprocessed.csv of a dataset as a float32 .npy file (row-major) next to it,
+    with the column names and the columns of each fairness role (from
+    features_preprocessed.yaml) in data_preprocessed.json. The csv file is converted chunk
+    by chunk, so the dataset does not have to fit into memory.
+
+    Returns:
+    --------
+    tuple
+        Shape of the array
+    """
+    csv_path, yaml_path = get_dataset_paths(name, 'preprocessed', data_dir)
+    if yaml_path is None:
+        raise ValueError(f"Dataset '{name}' has no features_preprocessed.yaml")
+    schema = load_feature_schema(yaml_path)
+    array_path, metadata_path = _array_paths(name, data_dir)
+    csv_stat = os.stat(csv_path)
+
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    shape = (schema.n_samples, len(columns))
+    array = np.lib.format.open_memmap(array_path + '.tmp', mode='w+', dtype=ARRAY_DTYPE, shape=shape)
+    start = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        non_numerical = [column for column, dtype in chunk.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+        if non_numerical:
+            raise ValueError(f"Columns of dataset '{name}' are not numerical: {non_numerical}")
+        if start + len(chunk) > shape[0]:
+            raise ValueError(f"Dataset '{name}' has more rows than n_samples ({shape[0]}) in {yaml_path}")
+        array[start:start + len(chunk)] = chunk.to_numpy(dtype=ARRAY_DTYPE, na_value=np.nan)
+        start += len(chunk)
+    if start != shape[0]:
+        raise ValueError(f"Dataset '{name}' has {start} rows but n_samples is {shape[0]} in {yaml_path}")
+    array.flush()
+    del array
+    os.replace(array_path + '.tmp', array_path)
+
+    with open(metadata_path, 'w') as file:
+        json.dump({
+            'name': name,
+            'dtype': np.dtype(ARRAY_DTYPE).name,
+            'shape': list(shape),
+            'columns': columns,
+            'roles': {role: _column_selection(schema.get_features(role)) for role in FAIRNESS_ROLES
+                      if role in schema.fairness},
+            'source': {'size': csv_stat.st_size, 'mtime_ns': csv_stat.st_mtime_ns},
+        }, file, indent=1)
+    return shape
+
+
+def load_array_metadata(name, data_dir=DATA_DIR):
+    _, metadata_path = _array_paths(name, data_dir)
+    with open(metadata_path, 'r') as file:
+        return json.load(file)
+
+
+def _role_view(array, selections):
+    # Consecutive column ranges are a view of the memory-mapped file, other selections a copy
+    selections = [selection for selection in selections if 'start' in selection or selection['indices']]
+    if all('start' in selection for selection in selections) and all(
+            previous['stop'] == current['start'] for previous, current in zip(selections, selections[1:])):
+        return array[:, selections[0]['start']:selections[-1]['stop']] if selections else array[:, :0]
+    indices = [index for selection in selections
+               for index in selection.get('indices', range(selection.get('start', 0), selection.get('stop', 0)))]
+    return array[:, indices]
+
+
+def load_arrays(name, data_dir=DATA_DIR, mmap_mode='r'):
+    """
+    Memory-maps the array written by export_arrays() and returns views of its columns, so
+    that processes loading the same dataset share one copy in the page cache.
+
+    The columns of each role are in the order of features_preprocessed.yaml. They are a
+    slice of the array, without copy, if they are consecutive and in file order, which is
+    the case after the order_columns step. X is a slice as well if the covariate columns
+    follow the sensitive columns.
+
+    Returns:
+    --------
+    dict
+        The arrays 'X' (sensitive and covariate features), 'T' (treatment) and 'Y'
+        (target) and the array of each fairness role
+    """
+    array_path, _ = _array_paths(name, data_dir)
+    metadata = load_array_metadata(name, data_dir)
+    csv_path, _ = get_dataset_paths(name, 'preprocessed', data_dir)
+    if os.path.exists(csv_path):
+        csv_stat = os.stat(csv_path)
+        if (csv_stat.st_size, csv_stat.st_mtime_ns) != (metadata['source']['size'], metadata['source']['mtime_ns']):
+            warn(f"{csv_path} changed after {array_path} was written, export the arrays again")
+
+    array = np.load(array_path, mmap_mode=mmap_mode)
+    if list(array.shape) != metadata['shape']:
+        raise ValueError(f"Shape of {array_path} is {array.shape}, expected {metadata['shape']}")
+
+    roles = metadata['roles']
+    arrays = {role: _role_view(array, [columns]) for role, columns in roles.items()}
+    for key, model_roles in MODEL_ROLES.items():
+        arrays[key] = _role_view(array, [roles[role] for role in model_roles if role in roles])
+    return arrays
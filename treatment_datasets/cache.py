@@ -0,0 +1,165 @@
+import hashlib
+import inspect
+import json
+import os
+import types
+
+import pandas as pd
+
+
+CACHE_EXTENSION = '.pkl'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _is_repository_code(value):
+    # Functions and classes of this repository, not of pandas or numpy
+    module = getattr(value, '__module__', None) or ''
+    return module == 'utils' or module.startswith('treatment_datasets')
+
+
+def _code_names(code):
+    # Names used by a code object and by the functions and comprehensions defined in it
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _code_names(constant)
+    return names
+
+
+def code_fingerprint(function, _seen=None):
+    """
+    Returns a hash of the source code of a function or class and of the functions, classes
+    and constants of this repository it refers to by name in its module (recursively, e.g.
+    utils.one_hot_encode or stats.MinMaxStatistics for a pipeline step). The methods of a
+    class are followed as well. Editing any of them changes the fingerprint.
+    """
+    # Instrumented functions are wrappers, their code is the wrapped function
+    function = inspect.unwrap(function)
+    seen = _seen if _seen is not None else set()
+    if function in seen:
+        return ''
+    seen.add(function)
+
+    digest = hashlib.sha256(inspect.getsource(function).encode())
+    if isinstance(function, type):
+        for name, member in sorted(vars(function).items()):
+            member = getattr(member, '__func__', getattr(member, 'fget', member))
+            if isinstance(member, types.FunctionType):
+                digest.update(code_fingerprint(member, seen).encode())
+        return digest.hexdigest()
+
+    module_globals = function.__globals__
+    for name in sorted(_code_names(function.__code__)):
+        if name not in module_globals:
+            continue
+        value = module_globals[name]
+        if isinstance(value, (types.FunctionType, type)):
+            if _is_repository_code(value):
+                digest.update(code_fingerprint(value, seen).encode())
+        elif not isinstance(value, types.ModuleType) and not callable(value):
+            digest.update(f"{name}={value!r}".encode())
+    return digest.hexdigest()
+
+
+def fingerprint(*parts):
+    """
+    Returns a hash of JSON-serializable parts, e.g. parameters of a step.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StepCache:
+    """
+    Content-addressed on-disk cache of pipeline stage results.
+    
+    Each entry is a pickle file named after its key. Reading an entry updates its
+    modification time, which is used to evict the least recently used entries once
+    the total size exceeds max_bytes. Entries are written atomically, so the cache can
+    be shared by builds running in parallel processes.
+    
+    Parameters:
+    -----------
+    directory : str
+        Directory containing the cache entries
+    max_bytes : int
+        Size limit of the cache, enforced after each write
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(CACHE_EXTENSION):
+                try:
+                    stat = os.stat(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    # Removed by a build running in another process
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, file_name))
+        return entries
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """
+        Returns the cached value of key, or None if it is not cached.
+        """
+        path = self._path(key)
+        try:
+            value = pd.read_pickle(path)
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        pd.to_pickle(value, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes=None):
+        """
+        Removes the least recently used entries until the cache is not larger than
+        max_bytes (by default the limit of the cache).
+        
+        Returns:
+        --------
+        tuple
+            Number of removed entries and number of freed bytes
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed, freed = 0, 0
+        for _, size, file_name in entries:
+            if total <= max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def clear(self):
+        return self.evict(0)
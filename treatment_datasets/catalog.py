@@ -0,0 +1,223 @@
+import json
+import os
+
+import pandas as pd
+
+from utils import (
+    DATA_DIR,
+    FAIRNESS_ROLES,
+    file_hash,
+    get_dataset_paths,
+    get_features_type_info,
+    load_dataset,
+    load_feature_schema,
+    profile_missing_values,
+)
+
+
+CATALOG_VERSION = 1
+# Treatment features with at most this many values get their value fractions in the catalog
+MAX_PREVALENCE_LEVELS = 10
+
+
+def default_catalog_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, '.cache', 'catalog.json')
+
+
+def list_datasets(data_dir=DATA_DIR):
+    """
+    Returns the names of the dataset folders of data_dir that have a feature YAML, sorted.
+    """
+    names = []
+    for name in sorted(os.listdir(data_dir)):
+        if os.path.isdir(os.path.join(data_dir, name)) and get_dataset_paths(name, 'raw', data_dir)[1] is not None:
+            names.append(name)
+    return names
+
+
+def _file_state(path, previous=None):
+    # Size, modification time and hash of a file; the hash of previous is reused if the file is unchanged
+    if path is None or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    state = {'path': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and (previous['path'], previous['size'], previous['mtime_ns']) == (
+            state['path'], state['size'], state['mtime_ns']):
+        state['sha256'] = previous['sha256']
+    else:
+        state['sha256'] = file_hash(path)
+    return state
+
+
+def summarize_dataset(name, data_dir=DATA_DIR):
+    """
+    Returns the catalog entry of a dataset: the features of each fairness role and
+    structural type from its raw feature YAML and, if the raw csv file exists, the number
+    of samples, the dtype, missing value rate and number of unique values of each column
+    and the value fractions of the treatment features.
+    """
+    csv_path, yaml_path = get_dataset_paths(name, 'raw', data_dir)
+    schema = load_feature_schema(yaml_path)
+    entry = {
+        'name': name,
+        # Templates of feature YAMLs have placeholders instead of the number of samples
+        'n_samples': schema.n_samples if isinstance(schema.n_samples, int) else None,
+        'roles': {role: schema.get_features(role) for role in FAIRNESS_ROLES},
+        'structural': {structure_type: schema.get_structural_features(structure_type)
+                       for structure_type in ('numerical', 'categorical')},
+        'columns': None,
+        'treatment_prevalence': None,
+    }
+    if not os.path.exists(csv_path):
+        return entry
+
+    df = load_dataset(name, 'raw', data_dir, apply_dtypes=False)
+    type_info = get_features_type_info(df)
+    missing = profile_missing_values(df)
+    entry['n_samples'] = len(df)
+    entry['columns'] = {
+        feature: {
+            'dtype': data_type,
+            'cardinality': int(nunique),
+            'missing_rate': float(missing_percentage) / 100,
+            'role': schema.get_role(feature),
+            'type': schema.get_structural_type(feature),
+        }
+        for feature, data_type, nunique, missing_percentage in zip(
+            type_info['feature'], type_info['data_type'], type_info['nunique_values'],
+            missing['Missing_Percentage'])
+    }
+
+    prevalence = {}
+    for feature in schema.get_features('treatment', df.columns):
+        if entry['columns'][feature]['cardinality'] <= MAX_PREVALENCE_LEVELS:
+            fractions = df[feature].value_counts(normalize=True, sort=False).sort_index()
+            prevalence[feature] = {str(value): float(fraction) for value, fraction in fractions.items()}
+    entry['treatment_prevalence'] = prevalence
+    return entry
+
+
+def load_catalog(path=None, data_dir=DATA_DIR):
+    """
+    Loads the catalog written by build_catalog(), or returns an empty catalog if there is
+    none (or it has another version).
+    """
+    path = path or default_catalog_path(data_dir)
+    try:
+        with open(path, 'r') as file:
+            catalog = json.load(file)
+    except (OSError, ValueError):
+        return {'version': CATALOG_VERSION, 'datasets': {}}
+    if catalog.get('version') != CATALOG_VERSION:
+        return {'version': CATALOG_VERSION, 'datasets': {}}
+    return catalog
+
+
+def build_catalog(data_dir=DATA_DIR, path=None, rebuild=False):
+    """
+    Updates the catalog of the datasets of data_dir and writes it to path (by default
+    data/.cache/catalog.json). Only datasets whose raw csv file or feature YAML changed
+    since the last build are summarized again (all of them if rebuild is True); datasets
+    that no longer exist are removed.
+
+    Returns:
+    --------
+    tuple
+        The catalog and the names of the summarized datasets
+    """
+    path = path or default_catalog_path(data_dir)
+    catalog = {'version': CATALOG_VERSION, 'datasets': {}} if rebuild else load_catalog(path)
+    previous_entries = catalog['datasets']
+    datasets = {}
+    updated = []
+
+    for name in list_datasets(data_dir):
+        csv_path, yaml_path = get_dataset_paths(name, 'raw', data_dir)
+        previous = previous_entries.get(name) or {}
+        previous_files = previous.get('files') or {}
+        files = {
+            'csv': _file_state(csv_path, previous_files.get('csv')),
+            'yaml': _file_state(yaml_path, previous_files.get('yaml')),
+        }
+        unchanged = previous and all(
+            (files[key] or {}).get('sha256') == (previous_files.get(key) or {}).get('sha256') for key in files)
+        if unchanged:
+            entry = previous
+        else:
+            entry = summarize_dataset(name, data_dir)
+            updated.append(name)
+        entry['files'] = files
+        datasets[name] = entry
+
+    catalog['datasets'] = datasets
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(catalog, file, indent=1)
+    os.replace(path + '.tmp', path)
+    return catalog, updated
+
+
+def is_binary_treatment(entry):
+    """
+    Returns True if the dataset has treatment features and each of them has two values.
+    """
+    columns = entry.get('columns') or {}
+    treatments = entry['roles'].get('treatment') or []
+    return bool(treatments) and all(
+        feature in columns and columns[feature]['cardinality'] == 2 for feature in treatments)
+
+
+def find_datasets(catalog, min_samples=None, binary_treatment=None, max_missing_rate=None, **role_features):
+    """
+    Returns the names of the datasets of the catalog that match all given conditions.
+
+    Parameters:
+    -----------
+    catalog : dict
+        Catalog returned by build_catalog() or load_catalog()
+    min_samples : int, optional
+        Smallest number of samples
+    binary_treatment : bool, optional
+        Whether all treatment features have two values (see is_binary_treatment)
+    max_missing_rate : float, optional
+        Largest missing value rate of the sensitive, covariate, treatment and target features
+    role_features : str or list
+        Features that a role must contain, e.g. sensitive='race'
+
+    Returns:
+    --------
+    list
+        Names of the matching datasets, sorted
+    """
+    for role in role_features:
+        if role not in FAIRNESS_ROLES:
+            raise ValueError(f"Unknown fairness role '{role}', expected one of {FAIRNESS_ROLES}")
+
+    names = []
+    for name, entry in sorted(catalog['datasets'].items()):
+        if min_samples is not None and (entry.get('n_samples') or 0) < min_samples:
+            continue
+        if binary_treatment is not None and is_binary_treatment(entry) != binary_treatment:
+            continue
+        if any(not set([features] if isinstance(features, str) else features).issubset(entry['roles'].get(role) or [])
+               for role, features in role_features.items()):
+            continue
+        if max_missing_rate is not None:
+            columns = entry.get('columns')
+            if columns is None:
+                continue
+            rates = [columns[feature]['missing_rate'] for role in FAIRNESS_ROLES if role != 'other'
+                     for feature in entry['roles'].get(role) or [] if feature in columns]
+            if rates and max(rates) > max_missing_rate:
+                continue
+        names.append(name)
+    return names
+
+
+def catalog_columns(catalog, name):
+    """
+    Returns the column statistics of a dataset of the catalog as a dataframe.
+    """
+    columns = catalog['datasets'][name].get('columns') or {}
+    return pd.DataFrame.from_dict(columns, orient='index', columns=['role', 'type', 'dtype', 'cardinality',
+                                                                    'missing_rate'])
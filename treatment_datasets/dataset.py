@@ -0,0 +1,160 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils import (
+    DATA_DIR,
+    FAIRNESS_ROLES,
+    STRUCTURAL_TYPES,
+    get_dataset_paths,
+    load_dataset,
+    load_feature_schema,
+    resolve_feature_names,
+)
+
+
+# Memory of the columns a Dataset keeps loaded, in bytes
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+
+class Dataset:
+    """
+    Lazy handle of a dataset stage that only reads the columns it is asked for.
+
+    The role accessors (sensitive, covariate, treatment, target, other) and structural
+    accessors (numerical, categorical) resolve their column names from the feature YAML
+    and return a dataframe with these columns only. Columns are read with
+    load_dataset(columns=...), i.e. projected from the Parquet cache if it is valid and
+    parsed from the csv file with usecols otherwise. Loaded columns are kept in memory and
+    the least recently used ones are dropped once they exceed max_bytes.
+
+    Parameters:
+    -----------
+    name : str
+        Name of the dataset, i.e. its folder in data_dir
+    stage : str
+        'raw' for data.csv or 'preprocessed' for data_preprocessed.csv
+    data_dir : str
+        Directory containing the dataset folders
+    use_cache : bool
+        Whether the typed columnar cache of load_dataset is read
+    apply_dtypes : bool
+        If True, the dtypes declared by the feature YAML are applied
+    max_bytes : int
+        Memory of the loaded columns that are kept for later accesses
+    """
+
+    def __init__(self, name, stage='raw', data_dir=DATA_DIR, use_cache=True, apply_dtypes=True,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.name = name
+        self.stage = stage
+        self.data_dir = data_dir
+        self.use_cache = use_cache
+        self.apply_dtypes = apply_dtypes
+        self.max_bytes = max_bytes
+        self.csv_path, yaml_path = get_dataset_paths(name, stage, data_dir)
+        if yaml_path is None:
+            raise ValueError(f"Dataset '{name}' has no feature YAML for stage '{stage}'")
+        self.schema = load_feature_schema(yaml_path)
+        self._columns = None
+        self._loaded = OrderedDict()
+        self._loaded_bytes = 0
+
+    def __repr__(self):
+        return f"Dataset('{self.name}', stage='{self.stage}', loaded columns={len(self._loaded)})"
+
+    @property
+    def columns(self):
+        """
+        Names of all columns, read from the header of the csv file.
+        """
+        if self._columns is None:
+            self._columns = list(pd.read_csv(self.csv_path, nrows=0).columns)
+        return self._columns
+
+    def features(self, group):
+        """
+        Returns the columns of a fairness role or structural type, in YAML order.
+        """
+        if group in FAIRNESS_ROLES:
+            features = self.schema.get_features(group)
+        elif group in STRUCTURAL_TYPES:
+            features = self.schema.get_structural_features(group)
+        else:
+            raise ValueError(f"Unknown role or structural type '{group}', "
+                             f"expected one of {FAIRNESS_ROLES + STRUCTURAL_TYPES}")
+        # Preprocessed YAML files list column indexes
+        return resolve_feature_names(features, self.columns)
+
+    def load(self, columns):
+        """
+        Returns a dataframe with the given columns. Columns that are not loaded yet are read
+        together, in a single pass.
+        """
+        columns = list(columns)
+        missing = list(dict.fromkeys(column for column in columns if column not in self._loaded))
+        read = load_dataset(self.name, self.stage, self.data_dir, self.use_cache, self.apply_dtypes,
+                            columns=missing) if missing else None
+
+        values = {}
+        for column in columns:
+            if column in self._loaded:
+                self._loaded.move_to_end(column)
+                values[column] = self._loaded[column][0]
+            else:
+                values[column] = read[column]
+        df = pd.DataFrame(values, columns=columns)
+
+        for column in missing:
+            self._remember(column, read[column])
+        return df
+
+    def _remember(self, column, values):
+        size = values.memory_usage(index=False, deep=True)
+        if size > self.max_bytes:
+            return
+        self._loaded[column] = (values, size)
+        self._loaded_bytes += size
+        while self._loaded_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._loaded.popitem(last=False)
+            self._loaded_bytes -= evicted_size
+
+    def clear(self):
+        """
+        Drops all loaded columns.
+        """
+        self._loaded.clear()
+        self._loaded_bytes = 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.load([key])[key]
+        return self.load(key)
+
+    @property
+    def sensitive(self):
+        return self.load(self.features('sensitive'))
+
+    @property
+    def covariate(self):
+        return self.load(self.features('covariate'))
+
+    @property
+    def treatment(self):
+        return self.load(self.features('treatment'))
+
+    @property
+    def target(self):
+        return self.load(self.features('target'))
+
+    @property
+    def other(self):
+        return self.load(self.features('other'))
+
+    @property
+    def numerical(self):
+        return self.load(self.features('numerical'))
+
+    @property
+    def categorical(self):
+        return self.load(self.features('categorical'))
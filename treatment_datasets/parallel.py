@@ -0,0 +1,135 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils import DATA_DIR, get_dataset_paths
+
+from . import trace
+from .arrays import export_arrays
+from .pipeline import load_pipeline
+
+
+# Peak memory of an in-memory build relative to the parsed raw dataframe (copies made by
+# slicing, one-hot encoding and scaling)
+MEMORY_FACTOR = 4
+SAMPLE_ROWS = 1000
+
+
+def estimate_memory(name, data_dir=DATA_DIR, sample_rows=SAMPLE_ROWS):
+    """
+    Estimates the memory of the parsed raw csv file of a dataset from its first
+    sample_rows rows, without reading the whole file.
+
+    Returns:
+    --------
+    tuple
+        Estimated number of rows and number of bytes per row
+    """
+    csv_path, _ = get_dataset_paths(name, 'raw', data_dir)
+    with open(csv_path, 'rb') as file:
+        header = file.readline()
+        sample = [line for _, line in zip(range(sample_rows), file)]
+    if not sample:
+        return 0, 0
+
+    df = pd.read_csv(csv_path, nrows=len(sample))
+    sample_size = sum(len(line) for line in sample)
+    n_rows = int((os.path.getsize(csv_path) - len(header)) * len(sample) / sample_size)
+    return n_rows, df.memory_usage(index=False, deep=True).sum() / len(df)
+
+
+def plan_chunksize(name, memory_budget, data_dir=DATA_DIR):
+    """
+    Returns the chunk size for a streaming build that keeps the memory of building the
+    dataset below memory_budget (in bytes), or None if the dataset can be built in memory.
+    The memory is estimated with estimate_memory(), it is not a hard limit.
+    """
+    n_rows, row_bytes = estimate_memory(name, data_dir)
+    if not row_bytes or n_rows * row_bytes * MEMORY_FACTOR <= memory_budget:
+        return None
+    return max(int(memory_budget / (row_bytes * MEMORY_FACTOR)), 1)
+
+
+def build_dataset(name, data_dir=DATA_DIR, cache=None, chunksize=None, memory_budget=None, column_workers=1,
+                  arrays=False, tracing=False, trace_allocations=False):
+    """
+    Builds a single dataset with its pipeline. Without chunksize, a streaming build is used
+    if the dataset is estimated not to fit into memory_budget (see plan_chunksize()). If
+    arrays is True, the result is also exported as memory-mappable array (see export_arrays()).
+    If tracing is True, the steps and utils functions are traced (see trace.tracing()).
+
+    Returns:
+    --------
+    dict
+        Name of the dataset, number of rows and columns written, chunk size (None for an
+        in-memory build), wall time in seconds and, if traced, the trace
+    """
+    if not tracing:
+        return _build_dataset(name, data_dir, cache, chunksize, memory_budget, column_workers, arrays)
+    with trace.tracing(trace_allocations) as tracer:
+        with tracer.span('build', 'dataset'):
+            result = _build_dataset(name, data_dir, cache, chunksize, memory_budget, column_workers, arrays)
+    result['trace'] = tracer.to_dict()
+    return result
+
+
+def _build_dataset(name, data_dir, cache, chunksize, memory_budget, column_workers, arrays):
+    start = time.perf_counter()
+    if chunksize is None and memory_budget is not None:
+        chunksize = plan_chunksize(name, memory_budget, data_dir)
+    pipeline = load_pipeline(name, data_dir, column_workers=column_workers)
+    state, n_rows = pipeline.build(cache=None if chunksize else cache, chunksize=chunksize)
+    if arrays:
+        with trace.span('export_arrays', 'io'):
+            export_arrays(name, data_dir, chunksize or 100_000)
+    return {
+        'name': name,
+        'rows': n_rows,
+        'columns': state.df.shape[1],
+        'chunksize': chunksize,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def build_datasets(names, data_dir=DATA_DIR, max_workers=None, cache=None, chunksize=None, memory_budget=None,
+                   column_workers=1, arrays=False, tracing=False, trace_allocations=False, callback=None):
+    """
+    Builds several datasets, each in its own worker process. At most max_workers datasets
+    (by default the number of CPUs) are built at the same time. A single dataset or worker
+    is built in the current process.
+
+    A dataset that fails to build does not stop the others: its result contains the
+    exception as 'error' instead of the numbers of build_dataset(). callback is called with
+    each result as soon as the dataset is built.
+
+    Returns:
+    --------
+    list
+        The results of build_dataset(), in the order of names
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, len(names))
+    kwargs = dict(data_dir=data_dir, cache=cache, chunksize=chunksize, memory_budget=memory_budget,
+                  column_workers=column_workers, arrays=arrays, tracing=tracing, trace_allocations=trace_allocations)
+    results = {}
+
+    def finish(name, get_result):
+        try:
+            result = get_result()
+        except Exception as error:
+            result = {'name': name, 'error': error}
+        results[name] = result
+        if callback is not None:
+            callback(result)
+
+    if max_workers <= 1:
+        for name in names:
+            finish(name, lambda: build_dataset(name, **kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = {executor.submit(build_dataset, name, **kwargs): name for name in names}
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+
+    return [results[name] for name in names]
@@ -0,0 +1,714 @@
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+import yaml
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+from utils import (
+    DATA_DIR,
+    FAIRNESS_ROLES,
+    FeatureSchema,
+    create_yaml_structure,
+    downcast_dtypes,
+    expand_encoded_features,
+    file_hash,
+    get_dataset_paths,
+    load_dataset,
+    load_feature_schema,
+    map_icd9_category_series,
+    one_hot_encode,
+)
+
+from . import trace
+from .cache import code_fingerprint, fingerprint
+from .stats import (
+    CountStatistics,
+    DistinctStatistics,
+    MinMaxStatistics,
+    ValueCountsStatistics,
+    ValueFractionStatistics,
+    load_step_statistics,
+    save_step_statistics,
+)
+from .writer import CsvWriter
+
+
+PIPELINE_FILE = 'pipeline.yaml'
+STATISTICS_FILE = 'statistics.yaml'
+
+_COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+# dtypes numexpr computes with, smaller integers are converted to int32
+_NUMEXPR_DTYPES = (np.int32, np.int64, np.float32, np.float64)
+
+
+class PipelineState:
+    """
+    Data passed from step to step: the dataframe, the raw feature schema, the mapping
+    from encoded features to their indicator columns and the statistics of stateful steps
+    (e.g. minimum and maximum for min-max scaling), keyed by the position of the step.
+    
+    Stateful steps use the statistics given to the pipeline, or fit them on the data they
+    see. While observing, stateful steps only add the data they see to their statistics
+    and leave the dataframe unchanged. This is how the passes of a streaming build fit
+    the statistics (see Pipeline.fit_streaming), after which the chunks are transformed.
+    
+    executor is a process pool that steps can use to process columns in parallel, or None.
+    
+    selection_report maps the position of selection steps to the number of rows and the
+    columns they removed, in addition to the previous steps (summed over the chunks of a
+    streaming build).
+    """
+
+    def __init__(self, df, schema):
+        self.df = df
+        self.schema = schema
+        self.dummy_columns = {}
+        self.statistics = {}
+        self.observing = False
+        self.step_id = None
+        self.executor = None
+        self.selection_report = {}
+
+    def get_statistics(self, new_statistics, get_data):
+        """
+        Returns the statistics of the current step. While observing, get_data() is added to
+        the statistics collected so far. Otherwise the fitted statistics are returned, and if
+        there are none, new_statistics is fitted on get_data() and kept.
+        """
+        if self.observing:
+            return self.statistics.setdefault(self.step_id, new_statistics).update(get_data())
+        if self.step_id not in self.statistics:
+            self.statistics[self.step_id] = new_statistics.update(get_data())
+        return self.statistics[self.step_id]
+
+
+# Selection steps only decide which rows and columns are kept. Consecutive selection steps
+# are fused: they update a row mask and a column list and the dataframe is sliced once.
+
+def _drop_columns(df, rows, kept_columns, state, columns):
+    kept = set(kept_columns)
+    missing = [column for column in columns if column not in kept]
+    if missing:
+        raise ValueError(f"Columns not found in dataframe: {missing}")
+    columns = set(columns)
+    return rows, [column for column in kept_columns if column not in columns]
+
+
+def _condition_mask(df, condition):
+    column, op = condition['column'], condition['op']
+    if op == 'between':
+        low, high = condition['value']
+        return (df[column] >= low) & (df[column] <= high)
+    if op in ('in', 'not in'):
+        mask = df[column].isin(condition['value'])
+        return ~mask if op == 'not in' else mask
+    if op not in _COMPARISONS:
+        raise ValueError(f"Unknown operator '{op}', expected one of {list(_COMPARISONS) + ['between', 'in', 'not in']}")
+    other = df[condition['other']] if 'other' in condition else condition['value']
+    return _COMPARISONS[op](df[column], other)
+
+
+def _numexpr_operand(df, name, local_dict):
+    # Numpy array of a numerical column as numexpr variable, None for other columns
+    values = df[name]
+    if not isinstance(values.dtype, np.dtype) or values.dtype.kind not in 'iuf':
+        return None
+    values = values.to_numpy()
+    if values.dtype not in _NUMEXPR_DTYPES:
+        if values.dtype.kind == 'f' or values.dtype.itemsize > 2:
+            return None
+        values = values.astype(np.int32)
+    variable = f'x{len(local_dict)}'
+    local_dict[variable] = values
+    return variable
+
+
+def _numexpr_condition(df, condition, local_dict):
+    # numexpr expression of a comparison of a numerical column with a number or another
+    # numerical column, None if numexpr cannot evaluate the condition
+    op = condition['op']
+    if op not in _COMPARISONS and op != 'between' or op == 'between' and 'other' in condition:
+        return None
+    if 'other' not in condition:
+        values = list(condition['value']) if op == 'between' else [condition['value']]
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) and np.isfinite(value)
+                   for value in values):
+            return None
+    variables = dict(local_dict)
+    column = _numexpr_operand(df, condition['column'], variables)
+    if column is None:
+        return None
+    if 'other' in condition:
+        other = _numexpr_operand(df, condition['other'], variables)
+        if other is None:
+            return None
+        expression = f'({column} {op} {other})'
+    elif op == 'between':
+        expression = f'(({column} >= {values[0]!r}) & ({column} <= {values[1]!r}))'
+    else:
+        expression = f'({column} {op} {values[0]!r})'
+    local_dict.update(variables)
+    return expression
+
+
+def _filter_rows(df, rows, kept_columns, state, conditions):
+    # With numexpr, the comparisons of numerical columns are evaluated in one fused pass
+    expressions = []
+    local_dict = {}
+    for condition in conditions:
+        expression = _numexpr_condition(df, condition, local_dict) if numexpr is not None else None
+        if expression is None:
+            rows &= _condition_mask(df, condition).to_numpy(dtype=bool, na_value=False)
+        else:
+            expressions.append(expression)
+    if expressions:
+        rows &= numexpr.evaluate(' & '.join(expressions), local_dict=local_dict)
+    return rows, kept_columns
+
+
+def _drop_dominant_value(df, rows, kept_columns, state, value, threshold, role=None, features=None):
+    # Fractions are computed on the rows kept so far, as if the previous steps had been applied
+    if features is None:
+        features = state.schema.get_features(role)
+    kept = set(kept_columns)
+    candidates = [feature for feature in features if feature in kept]
+
+    statistics = state.get_statistics(ValueFractionStatistics(value), lambda: df.loc[rows, candidates])
+    if state.observing:
+        return rows, kept_columns
+
+    fractions = statistics.fractions()
+    dominated = set(fractions.index[fractions > threshold])
+    return rows, [column for column in kept_columns if column not in dominated]
+
+
+def _candidate_columns(state, kept_columns, role, features):
+    # Kept columns among the given features, the features of a role, or all kept columns
+    if features is None:
+        features = state.schema.get_features(role) if role is not None else kept_columns
+    kept = set(kept_columns)
+    return [feature for feature in features if feature in kept]
+
+
+def _drop_missing(df, rows, kept_columns, state, threshold, role=None, features=None):
+    # Columns with a fraction of missing values above threshold, like dropna(axis=1, thresh=...)
+    candidates = _candidate_columns(state, kept_columns, role, features)
+    statistics = state.get_statistics(CountStatistics(), lambda: df.loc[rows, candidates])
+    if state.observing:
+        return rows, kept_columns
+
+    missing_rates = statistics.null_counts / max(statistics.n_rows, 1)
+    dropped = set(missing_rates.index[missing_rates > threshold])
+    return rows, [column for column in kept_columns if column not in dropped]
+
+
+def _drop_constant(df, rows, kept_columns, state, unique=False, role=None, features=None):
+    # Columns with at most one distinct value and, if unique is True, identifier-like columns
+    # whose values are all distinct
+    candidates = _candidate_columns(state, kept_columns, role, features)
+    statistics = state.get_statistics(DistinctStatistics(unique), lambda: df.loc[rows, candidates])
+    if state.observing:
+        return rows, kept_columns
+
+    dropped = set(statistics.constant())
+    if unique:
+        dropped.update(statistics.unique())
+    return rows, [column for column in kept_columns if column not in dropped]
+
+
+SELECTION_STEPS = {
+    'drop_columns': _drop_columns,
+    'filter_rows': _filter_rows,
+    'drop_dominant_value': _drop_dominant_value,
+    'drop_missing': _drop_missing,
+    'drop_constant': _drop_constant,
+}
+
+
+def _optimize_dtypes(state, float_tolerance=0.0, max_category_ratio=0.5, unsigned=False):
+    state.df, _ = downcast_dtypes(state.df, state.schema, float_tolerance, max_category_ratio, unsigned)
+
+
+def _replace_values(state, values, value=None):
+    state.df = state.df.replace(values, pd.NA if value is None else value)
+
+
+def _map_icd9(state, columns):
+    if state.executor is None or len(columns) < 2:
+        for column in columns:
+            state.df[column] = map_icd9_category_series(state.df[column])
+        return
+    mapped = state.executor.map(map_icd9_category_series, [state.df[column] for column in columns])
+    for column, values in zip(columns, mapped):
+        state.df[column] = values
+
+
+def _order_columns(state):
+    state.df = state.df[state.schema.ordered_features(state.df.columns)]
+
+
+def _one_hot_encode(state, features=None, drop=None, sparse=False):
+    if features is None:
+        features = state.schema.get_structural_features('categorical', state.df.columns)
+
+    statistics = state.get_statistics(ValueCountsStatistics(), lambda: state.df[features])
+    if state.observing:
+        return
+    # A streaming build also collects statistics of columns that are dropped in the end
+    statistics = state.statistics[state.step_id] = statistics.select(features)
+    categories = {feature: statistics.categories(feature) for feature in features}
+
+    state.df, dummy_columns = one_hot_encode(state.df, features, sparse=sparse, drop=drop, categories=categories)
+    state.dummy_columns.update(dummy_columns)
+
+
+def minmax_scale(values, data_min=None, data_max=None):
+    """
+    Scales the columns of a 2D array to [0, 1], with the same arithmetic as
+    sklearn.preprocessing.MinMaxScaler so that the results are identical. The minimum
+    and maximum of each column are computed from values unless they are given.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if data_min is None:
+        data_min = np.nanmin(values, axis=0)
+    if data_max is None:
+        data_max = np.nanmax(values, axis=0)
+    data_min = np.asarray(data_min, dtype=np.float64)
+    data_range = np.asarray(data_max, dtype=np.float64) - data_min
+    # Constant columns, and columns whose range is close to machine precision, are not
+    # scaled, as in sklearn (_handle_zeros_in_scale)
+    scale = 1.0 / np.where(data_range < 10 * np.finfo(np.float64).eps, 1.0, data_range)
+    return values * scale + (0.0 - data_min * scale)
+
+
+def _minmax_scale(state, features=None):
+    if features is None:
+        features = state.schema.get_structural_features('numerical', state.df.columns)
+    if not features:
+        return
+
+    statistics = state.get_statistics(MinMaxStatistics(), lambda: state.df[features])
+    if state.observing:
+        return
+    statistics = state.statistics[state.step_id] = statistics.select(features)
+
+    values = state.df[features].to_numpy(dtype=np.float64, na_value=np.nan)
+    state.df[features] = minmax_scale(values, statistics.data_min[features], statistics.data_max[features])
+
+
+TRANSFORM_STEPS = {
+    'optimize_dtypes': _optimize_dtypes,
+    'replace_values': _replace_values,
+    'map_icd9': _map_icd9,
+    'order_columns': _order_columns,
+    'one_hot_encode': _one_hot_encode,
+    'minmax_scale': _minmax_scale,
+}
+
+# Steps whose statistics are fitted on the data (see PipelineState.get_statistics)
+STATEFUL_STEPS = {'drop_dominant_value', 'drop_missing', 'drop_constant', 'one_hot_encode', 'minmax_scale'}
+
+
+class Pipeline:
+    """
+    Preprocessing pipeline of a dataset, declared in data/<dataset>/pipeline.yaml.
+    
+    The YAML file lists the steps in order, each as a mapping from the step name to
+    its parameters, e.g.
+    
+        steps:
+          - drop_columns:
+              columns: [weight, payer_code]
+          - filter_rows:
+              conditions:
+                - {column: gender, op: "!=", value: Unknown/Invalid}
+          - one_hot_encode:
+              drop: [gender_Female]
+    
+    Selection steps (see SELECTION_STEPS) that follow each other are evaluated on the
+    unsliced dataframe and applied with a single slice. Transform steps (see
+    TRANSFORM_STEPS) modify the dataframe in place where pandas allows it.
+    
+    The optional top-level key float_precision sets the number of decimals of the floats
+    in data_preprocessed.csv (see writer.CsvWriter), by default they are written in full.
+    
+    Parameters:
+    -----------
+    name : str
+        Name of the dataset, i.e. its folder in data_dir
+    steps : list
+        List of (step name, parameters) tuples
+    schema : str
+        File name of the raw feature YAML in the dataset folder
+    data_dir : str
+        Directory containing the dataset folders
+    column_workers : int
+        Number of processes that steps processing columns independently (e.g. map_icd9)
+        use; 1 processes all columns in the current process. The output csv file is
+        formatted by as many processes
+    float_precision : int, optional
+        Number of decimals of the floats in the output csv file
+    """
+
+    def __init__(self, name, steps, schema='features_raw.yaml', data_dir=DATA_DIR, column_workers=1,
+                 float_precision=None):
+        for step_name, _ in steps:
+            if step_name not in SELECTION_STEPS and step_name not in TRANSFORM_STEPS:
+                raise ValueError(f"Unknown pipeline step '{step_name}' in dataset '{name}'")
+        self.name = name
+        self.steps = steps
+        self.data_dir = data_dir
+        self.schema_path = os.path.join(data_dir, name, schema)
+        self.column_workers = column_workers
+        self.float_precision = float_precision
+
+    @classmethod
+    def from_yaml(cls, path, data_dir=None, column_workers=1):
+        with open(path, 'r') as file:
+            config = yaml.safe_load(file)
+        steps = []
+        for step in config.get('steps') or []:
+            (step_name, params), = step.items()
+            steps.append((step_name, params or {}))
+        if data_dir is None:
+            data_dir = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+        name = config.get('dataset') or os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return cls(name, steps, schema=config.get('schema', 'features_raw.yaml'), data_dir=data_dir,
+                   column_workers=column_workers, float_precision=config.get('float_precision'))
+
+    def plan(self):
+        """
+        Groups the steps into stages: ('select', [steps]) for runs of selection steps and
+        ('transform', [step]) for each transform step.
+        """
+        stages = []
+        for step in self.steps:
+            kind = 'select' if step[0] in SELECTION_STEPS else 'transform'
+            if kind == 'select' and stages and stages[-1][0] == 'select':
+                stages[-1][1].append(step)
+            else:
+                stages.append((kind, [step]))
+        return stages
+
+    def _column_executor(self):
+        if self.column_workers > 1:
+            return ProcessPoolExecutor(self.column_workers)
+        return nullcontext()
+
+    def _run_stage(self, state, stages, position):
+        # Position of the first step of the stage, used to key the statistics of the steps
+        step_id = sum(len(steps) for _, steps in stages[:position])
+        kind, steps = stages[position]
+        with trace.span('+'.join(step_name for step_name, _ in steps), 'step', state.df) as span:
+            if kind == 'select':
+                self._run_selection(state, steps, step_id)
+            else:
+                step_name, params = steps[0]
+                state.step_id = step_id
+                TRANSFORM_STEPS[step_name](state, **params)
+            if span is not None:
+                span.output(state.df)
+
+    def _run_selection(self, state, steps, step_id):
+        df = state.df
+        rows = np.ones(len(df), dtype=bool)
+        columns = list(df.columns)
+        for offset, (step_name, params) in enumerate(steps):
+            state.step_id = step_id + offset
+            n_rows = rows.sum()
+            previous_columns = columns
+            rows, columns = SELECTION_STEPS[step_name](df, rows, columns, state, **params)
+            if not state.observing:
+                report = state.selection_report.setdefault(
+                    state.step_id, {'step': step_name, 'rows_removed': 0, 'columns_removed': []})
+                report['rows_removed'] += int(n_rows - rows.sum())
+                ignored = set(columns).union(report['columns_removed'])
+                report['columns_removed'] += [column for column in previous_columns if column not in ignored]
+
+        if rows.all():
+            state.df = df[columns]
+        else:
+            column_positions = df.columns.get_indexer(columns)
+            state.df = df.iloc[np.flatnonzero(rows), column_positions]
+
+    def stage_keys(self, stages=None):
+        """
+        Returns the cache key of the result of each stage of plan(). The key of a stage
+        depends on the raw csv file, the feature schema, the code of PipelineState and
+        FeatureSchema, which steps reach through the state, and the parameters and code
+        (see cache.code_fingerprint()) of the stage and of all previous stages.
+        """
+        if stages is None:
+            stages = self.plan()
+        csv_path, _ = get_dataset_paths(self.name, 'raw', self.data_dir)
+        key = fingerprint(self.name, file_hash(csv_path), file_hash(self.schema_path),
+                          code_fingerprint(PipelineState), code_fingerprint(FeatureSchema))
+
+        keys = []
+        for kind, steps in stages:
+            registry = SELECTION_STEPS if kind == 'select' else TRANSFORM_STEPS
+            key = fingerprint(key, [
+                (step_name, params, code_fingerprint(registry[step_name])) for step_name, params in steps
+            ])
+            keys.append(key)
+        return keys
+
+    def run(self, df=None, cache=None, statistics=None):
+        """
+        Runs the pipeline on df (by default the raw data of the dataset) and returns the
+        final PipelineState.
+        
+        If a StepCache is given (only used when df and statistics are None), the result of
+        every stage is stored in it and the pipeline resumes after the last stage whose
+        result is cached.
+        
+        statistics maps the position of stateful steps to fitted statistics (see
+        load_statistics()), which are then used instead of being fitted on df, e.g. to
+        preprocess new data like the data the pipeline was built with.
+        """
+        schema = load_feature_schema(self.schema_path)
+        stages = self.plan()
+        use_cache = cache is not None and df is None and statistics is None
+        keys = self.stage_keys(stages) if use_cache else []
+
+        state = None
+        start = 0
+        for position in range(len(keys), 0, -1):
+            cached = cache.get(keys[position - 1])
+            if cached is not None:
+                state = PipelineState(cached['df'], schema)
+                state.dummy_columns = cached['dummy_columns']
+                state.statistics = cached['statistics']
+                state.selection_report = cached.get('selection_report', {})
+                start = position
+                break
+
+        if state is None:
+            if df is None:
+                df = load_dataset(self.name, 'raw', self.data_dir, apply_dtypes=False)
+            state = PipelineState(df, schema)
+            state.statistics = dict(statistics or {})
+
+        with self._column_executor() as state.executor:
+            for position in range(start, len(stages)):
+                self._run_stage(state, stages, position)
+                if keys:
+                    cache.put(keys[position], {
+                        'df': state.df,
+                        'dummy_columns': state.dummy_columns,
+                        'statistics': state.statistics,
+                        'selection_report': state.selection_report,
+                    })
+        state.executor = None
+
+        return state
+
+    def _read_chunks(self, chunksize, dtype=None):
+        csv_path, _ = get_dataset_paths(self.name, 'raw', self.data_dir)
+        with pd.read_csv(csv_path, chunksize=chunksize, dtype=dtype) as reader:
+            while True:
+                with trace.span('read_csv', 'io') as span:
+                    chunk = next(reader, None)
+                    if span is not None:
+                        span.output(chunk)
+                if chunk is None:
+                    return
+                yield chunk
+
+    def fit_streaming(self, chunksize):
+        """
+        First passes of a streaming build: read the raw csv file in chunks and collect the
+        statistics of the stateful steps (see STATEFUL_STEPS).
+        
+        Each stage with stateful steps is fitted in its own pass, on chunks transformed by
+        the stages before it with their fitted statistics, so that it sees the same data
+        as in run(). The stateful steps of one selection stage only collect per column
+        statistics of the rows kept by stateless steps, so they are fitted together.
+        
+        pd.read_csv infers the dtypes of each chunk separately. If they differ between
+        chunks (e.g. a column of integers with missing values in some chunks only), the
+        first pass is repeated with the dtypes that reading the whole file would give.
+        
+        Returns:
+        --------
+        tuple
+            The dtypes to read the chunks with (None if inference is consistent) and the
+            statistics of the stateful steps
+        """
+        schema = load_feature_schema(self.schema_path)
+        stages = self.plan()
+        stateful = [position for position, (_, steps) in enumerate(stages)
+                    if any(step_name in STATEFUL_STEPS for step_name, _ in steps)]
+        dtypes = None
+        statistics = {}
+
+        with self._column_executor() as executor:
+            # Without stateful steps, a single pass checks the dtypes
+            for target in stateful or [None]:
+                while True:
+                    state = PipelineState(None, schema)
+                    state.statistics = dict(statistics)
+                    state.executor = executor
+                    chunk_dtypes = {}
+                    consistent = True
+                    for chunk in self._read_chunks(chunksize, dtypes):
+                        for column, dtype in chunk.dtypes.items():
+                            merged = _merge_dtypes(chunk_dtypes[column], dtype) if column in chunk_dtypes else dtype
+                            consistent = consistent and merged == dtype and merged == chunk_dtypes.get(column, dtype)
+                            chunk_dtypes[column] = merged
+                        state.df = chunk
+                        state.dummy_columns = {}
+                        for position in range(0 if target is None else target + 1):
+                            state.observing = position == target
+                            self._run_stage(state, stages, position)
+
+                    if consistent or dtypes is not None:
+                        break
+                    dtypes = chunk_dtypes
+                statistics = state.statistics
+
+        return dtypes, statistics
+
+    def run_streaming(self, output_path, chunksize):
+        """
+        Runs the pipeline on the raw csv file in chunks of chunksize rows and appends the
+        result of each chunk to the csv file output_path. Only a few chunks are held in
+        memory. The output is identical to writing the result of run() with
+        writer.write_csv().
+        
+        Returns:
+        --------
+        tuple
+            The state of the last chunk and the CountStatistics of the rows written
+        """
+        dtypes, statistics = self.fit_streaming(chunksize)
+        stages = self.plan()
+
+        state = PipelineState(None, load_feature_schema(self.schema_path))
+        state.statistics = statistics
+        output_statistics = CountStatistics()
+        with self._column_executor() as state.executor, \
+                CsvWriter(output_path, self.float_precision, compression=None, chunksize=chunksize,
+                          executor=state.executor) as writer:
+            for chunk in self._read_chunks(chunksize, dtypes):
+                state.df = chunk
+                state.dummy_columns = {}
+                for position in range(len(stages)):
+                    self._run_stage(state, stages, position)
+                writer.write(state.df)
+                output_statistics.update(state.df)
+        state.executor = None
+
+        return state, output_statistics
+
+    def feature_structure(self, state, n_samples=None):
+        """
+        Returns the features_preprocessed.yaml structure of a pipeline result, with
+        n_samples as number of samples if given (e.g. for a streaming build).
+        """
+        columns = state.df.columns
+        fairness_dict = {
+            role: expand_encoded_features(state.schema.get_features(role), state.dummy_columns, columns)
+            for role in FAIRNESS_ROLES if role != 'other'
+        }
+        structural_dict = {
+            structure_type: expand_encoded_features(
+                state.schema.get_structural_features(structure_type), state.dummy_columns, columns)
+            for structure_type in ('numerical', 'categorical')
+        }
+        structure = create_yaml_structure(state.df, fairness_dict, structural_dict, self.name)
+        if n_samples is not None:
+            structure['dataset']['n_samples'] = n_samples
+        return structure
+
+    @property
+    def statistics_path(self):
+        return os.path.join(self.data_dir, self.name, STATISTICS_FILE)
+
+    def load_statistics(self):
+        """
+        Returns the statistics of the stateful steps written by the last build().
+        """
+        return load_step_statistics(self.statistics_path, self.steps)
+
+    def transform(self, df):
+        """
+        Preprocesses new data (e.g. a test set or a shard) with the statistics of the last
+        build() instead of fitting them on df, and returns the preprocessed dataframe.
+        """
+        return self.run(df, statistics=self.load_statistics()).df
+
+    def build(self, cache=None, chunksize=None):
+        """
+        Runs the pipeline and writes data_preprocessed.csv, features_preprocessed.yaml and
+        the fitted statistics of the stateful steps to statistics.yaml. See run() for the
+        cache. If chunksize is given, the raw csv file is processed in chunks with
+        run_streaming() and the cache is not used.
+        
+        Returns:
+        --------
+        tuple
+            The final state of the pipeline (of the last chunk for a streaming build) and
+            the number of rows written
+        """
+        csv_path, _ = get_dataset_paths(self.name, 'preprocessed', self.data_dir)
+        if chunksize:
+            state, output_statistics = self.run_streaming(csv_path, chunksize)
+        else:
+            state = self.run(cache=cache)
+            with self._column_executor() as executor, \
+                    CsvWriter(csv_path, self.float_precision, compression=None, executor=executor) as writer:
+                writer.write(state.df)
+            output_statistics = CountStatistics().update(state.df)
+        n_rows = output_statistics.n_rows
+
+        with open(os.path.join(os.path.dirname(csv_path), 'features_preprocessed.yaml'), 'w') as file:
+            yaml.dump(self.feature_structure(state, n_rows), file, sort_keys=False, default_flow_style=None)
+        save_step_statistics(self.statistics_path, state.statistics, self.steps, output_statistics,
+                             state.selection_report)
+
+        return state, n_rows
+
+
+def _merge_dtypes(dtype, other):
+    # dtype that pd.read_csv infers for a column whose chunks were inferred as dtype and other
+    if dtype == other:
+        return dtype
+    if dtype.kind in 'iuf' and other.kind in 'iuf':
+        return np.dtype(np.float64) if 'f' in (dtype.kind, other.kind) else np.dtype(np.int64)
+    if dtype.kind == 'b' or other.kind == 'b':
+        return np.dtype(object)
+    return pd.Series([], dtype=str).dtype
+
+
+def load_pipeline(name, data_dir=DATA_DIR, column_workers=1):
+    """
+    Loads the pipeline declared in data/<name>/pipeline.yaml.
+    """
+    return Pipeline.from_yaml(os.path.join(data_dir, name, PIPELINE_FILE), data_dir=data_dir,
+                              column_workers=column_workers)
+
+
+def list_pipelines(data_dir=DATA_DIR):
+    """
+    Returns the names of the datasets that declare a pipeline, sorted.
+    """
+    return sorted(
+        name for name in os.listdir(data_dir)
+        if os.path.exists(os.path.join(data_dir, name, PIPELINE_FILE))
+    )
@@ -0,0 +1,384 @@
+import numpy as np
+import pandas as pd
+import yaml
+
+
+# Statistics of stateful pipeline steps. Each accumulator can be updated chunk by chunk and
+# merged with accumulators computed on other chunks or in other processes, which gives the
+# same result as computing the statistics on the whole dataframe. Accumulators are
+# converted to plain dictionaries with to_dict() to be stored in a YAML file.
+
+
+def _to_python(values):
+    # numpy scalars cannot be written by yaml.safe_dump
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+
+class MinMaxStatistics:
+    """
+    Per column minimum and maximum, ignoring missing values.
+    """
+
+    type = 'min_max'
+
+    def __init__(self):
+        self.data_min = pd.Series(dtype=np.float64)
+        self.data_max = pd.Series(dtype=np.float64)
+
+    def update(self, df):
+        values = df.to_numpy(dtype=np.float64, na_value=np.nan)
+        if len(values):
+            # fmin/fmax ignore NaN unless all values of a column are NaN
+            chunk = MinMaxStatistics()
+            chunk.data_min = pd.Series(np.fmin.reduce(values, axis=0), index=df.columns)
+            chunk.data_max = pd.Series(np.fmax.reduce(values, axis=0), index=df.columns)
+            self.merge(chunk)
+        return self
+
+    def merge(self, other):
+        self.data_min = self.data_min.combine(other.data_min, np.fmin) if len(self.data_min) else other.data_min
+        self.data_max = self.data_max.combine(other.data_max, np.fmax) if len(self.data_max) else other.data_max
+        return self
+
+    def select(self, columns):
+        """
+        Returns the statistics of the given columns only.
+        """
+        statistics = MinMaxStatistics()
+        statistics.data_min = self.data_min[columns]
+        statistics.data_max = self.data_max[columns]
+        return statistics
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'min': dict(zip(self.data_min.index, _to_python(self.data_min))),
+            'max': dict(zip(self.data_max.index, _to_python(self.data_max))),
+        }
+
+    @classmethod
+    def from_dict(cls, content):
+        statistics = cls()
+        statistics.data_min = pd.Series(content['min'], dtype=np.float64)
+        statistics.data_max = pd.Series(content['max'], dtype=np.float64)
+        return statistics
+
+
+class CountStatistics:
+    """
+    Number of rows and per column number of missing values.
+    """
+
+    type = 'count'
+
+    def __init__(self):
+        self.n_rows = 0
+        self.null_counts = pd.Series(dtype=np.int64)
+
+    def update(self, df):
+        return self.merge_counts(len(df), df.isna().sum())
+
+    def merge_counts(self, n_rows, null_counts):
+        self.n_rows += n_rows
+        if len(self.null_counts):
+            null_counts = self.null_counts.add(null_counts, fill_value=0)
+        self.null_counts = null_counts.astype(np.int64)
+        return self
+
+    def merge(self, other):
+        return self.merge_counts(other.n_rows, other.null_counts)
+
+    def counts(self):
+        """
+        Returns the number of non-missing values of each column.
+        """
+        return self.n_rows - self.null_counts
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'n_rows': self.n_rows,
+            'null_counts': dict(zip(self.null_counts.index, _to_python(self.null_counts))),
+        }
+
+    @classmethod
+    def from_dict(cls, content):
+        return cls().merge_counts(content['n_rows'], pd.Series(content['null_counts'], dtype=np.int64))
+
+
+class ValueCountsStatistics:
+    """
+    Per column counts of the non-missing values.
+    """
+
+    type = 'value_counts'
+
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, df):
+        for column in df.columns:
+            counts = df[column].value_counts(dropna=True, sort=False)
+            # Unused categories of categorical columns are counted as 0
+            counts = counts[counts > 0]
+            if isinstance(counts.index, pd.CategoricalIndex):
+                counts.index = counts.index.astype(counts.index.categories.dtype)
+            self._add(column, counts)
+        return self
+
+    def _add(self, column, counts):
+        if column in self.counts:
+            self.counts[column] = self.counts[column].add(counts, fill_value=0).astype(np.int64)
+        else:
+            self.counts[column] = counts.astype(np.int64)
+
+    def merge(self, other):
+        for column, counts in other.counts.items():
+            self._add(column, counts)
+        return self
+
+    def select(self, columns):
+        """
+        Returns the statistics of the given columns only.
+        """
+        statistics = ValueCountsStatistics()
+        statistics.counts = {column: self.counts[column] for column in columns}
+        return statistics
+
+    def categories(self, column):
+        """
+        Returns the sorted values of a column, as pd.factorize(sort=True) would.
+        """
+        return pd.Index(self.counts[column].index).sort_values()
+
+    def to_dict(self):
+        counts = {}
+        for column, column_counts in self.counts.items():
+            # Sorted so that the output does not depend on how the data was chunked
+            column_counts = column_counts.iloc[self.categories(column).get_indexer(column_counts.index).argsort()]
+            counts[column] = dict(zip(_to_python(column_counts.index), _to_python(column_counts)))
+        return {'type': self.type, 'counts': counts}
+
+    @classmethod
+    def from_dict(cls, content):
+        statistics = cls()
+        for column, counts in content['counts'].items():
+            statistics.counts[column] = pd.Series(counts, dtype=np.int64)
+        return statistics
+
+
+class ValueFractionStatistics:
+    """
+    Per column number of values equal to a given value (e.g. 'No'), and number of rows.
+    """
+
+    type = 'value_fraction'
+
+    def __init__(self, value):
+        self.value = value
+        self.matches = pd.Series(dtype=np.int64)
+        self.n_rows = 0
+
+    def update(self, df):
+        matches = (df == self.value).sum().astype(np.int64)
+        self.matches = self.matches.add(matches, fill_value=0).astype(np.int64) if len(self.matches) else matches
+        self.n_rows += len(df)
+        return self
+
+    def merge(self, other):
+        if other.value != self.value:
+            raise ValueError(f"Cannot merge fractions of '{other.value}' into fractions of '{self.value}'")
+        self.matches = self.matches.add(other.matches, fill_value=0).astype(np.int64)
+        self.n_rows += other.n_rows
+        return self
+
+    def fractions(self):
+        return self.matches / self.n_rows
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'value': self.value,
+            'n_rows': self.n_rows,
+            'matches': dict(zip(self.matches.index, _to_python(self.matches))),
+        }
+
+    @classmethod
+    def from_dict(cls, content):
+        statistics = cls(content['value'])
+        statistics.n_rows = content['n_rows']
+        statistics.matches = pd.Series(content['matches'], dtype=np.int64)
+        return statistics
+
+
+class DistinctStatistics:
+    """
+    Per column number of non-missing values and number of distinct values, to find
+    constant columns and, if unique is True, columns whose values are all distinct.
+    
+    The number of distinct values of a column is not tracked further (None) once the
+    column cannot be constant, or with unique, once its values have duplicates and at
+    least two distinct values. Only the distinct values of the other columns are kept
+    while updating: at most two per column without unique.
+    
+    Statistics created with from_dict() only have the numbers and cannot be updated.
+    """
+
+    type = 'distinct'
+
+    def __init__(self, unique=False):
+        self.track_unique = unique
+        self.n_values = {}
+        self.n_distinct = {}
+        self._values = {}
+
+    def update(self, df):
+        for column in df.columns:
+            present = df[column].dropna()
+            if column in self.n_distinct and self.n_distinct[column] is None:
+                self._add(column, len(present), None)
+                continue
+            values = present.unique()
+            self._add(column, len(present), set(values if self.track_unique else values[:2]))
+        return self
+
+    def _tracked_values(self, column):
+        # Distinct values of a tracked column seen so far
+        if column not in self.n_distinct:
+            return set()
+        if column not in self._values:
+            raise ValueError(f"Distinct values of column '{column}' loaded from a file cannot be updated")
+        return self._values[column]
+
+    def _add(self, column, n_values, values):
+        self.n_values[column] = self.n_values.get(column, 0) + n_values
+        if values is None or self.n_distinct.get(column, 0) is None:
+            self.n_distinct[column] = None
+            self._values.pop(column, None)
+            return
+        values = self._tracked_values(column) | values
+        if len(values) > 1 and (not self.track_unique or len(values) < self.n_values[column]):
+            self.n_distinct[column] = None
+            self._values.pop(column, None)
+        else:
+            self.n_distinct[column] = len(values)
+            self._values[column] = values
+
+    def merge(self, other):
+        if other.track_unique != self.track_unique:
+            raise ValueError("Cannot merge distinct values tracked with and without unique")
+        for column, n_values in other.n_values.items():
+            n_distinct = other.n_distinct[column]
+            self._add(column, n_values, None if n_distinct is None else other._tracked_values(column))
+        return self
+
+    def constant(self):
+        """
+        Returns the columns with at most one distinct value.
+        """
+        return [column for column, n_distinct in self.n_distinct.items() if n_distinct is not None and n_distinct <= 1]
+
+    def unique(self):
+        """
+        Returns the columns whose values are all distinct, with at least two values.
+        """
+        if not self.track_unique:
+            raise ValueError("Distinct values were tracked without unique")
+        return [column for column, n_distinct in self.n_distinct.items()
+                if n_distinct is not None and n_distinct > 1 and n_distinct == self.n_values[column]]
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'unique': self.track_unique,
+            'n_values': {column: int(n_values) for column, n_values in self.n_values.items()},
+            'n_distinct': dict(self.n_distinct),
+        }
+
+    @classmethod
+    def from_dict(cls, content):
+        statistics = cls(content['unique'])
+        statistics.n_values = dict(content['n_values'])
+        statistics.n_distinct = dict(content['n_distinct'])
+        return statistics
+
+
+STATISTICS_TYPES = {
+    statistics_class.type: statistics_class
+    for statistics_class in (MinMaxStatistics, CountStatistics, ValueCountsStatistics, ValueFractionStatistics,
+                             DistinctStatistics)
+}
+
+
+def statistics_from_dict(content):
+    """
+    Creates an accumulator from the output of its to_dict().
+    """
+    if content.get('type') not in STATISTICS_TYPES:
+        raise ValueError(f"Unknown statistics type '{content.get('type')}', expected one of {list(STATISTICS_TYPES)}")
+    return STATISTICS_TYPES[content['type']].from_dict(content)
+
+
+def merge_step_statistics(step_statistics, other):
+    """
+    Merges the statistics of the steps of a pipeline computed on another part of the data
+    (e.g. by another worker) into step_statistics. Both map the position of a step to its
+    accumulator.
+    """
+    for step_id, statistics in other.items():
+        if step_id in step_statistics:
+            step_statistics[step_id].merge(statistics)
+        else:
+            step_statistics[step_id] = statistics
+    return step_statistics
+
+
+def save_step_statistics(path, step_statistics, steps, output_statistics=None, selection_report=None):
+    """
+    Writes the statistics of the steps of a pipeline, and optionally the statistics of its
+    output (e.g. CountStatistics of data_preprocessed.csv) and the rows and columns removed
+    by its selection steps, to a YAML file.
+    
+    Parameters:
+    -----------
+    path : str
+        Path of the YAML file
+    step_statistics : dict
+        Mapping from the position of a step to its accumulator
+    steps : list
+        The (step name, parameters) tuples of the pipeline, to check the file when loading it
+    output_statistics : accumulator, optional
+        Statistics of the output of the pipeline
+    selection_report : dict, optional
+        Mapping from the position of a selection step to the number of rows and the
+        columns it removed (see PipelineState.selection_report)
+    """
+    content = {
+        'steps': [
+            {'position': step_id, 'step': steps[step_id][0], 'statistics': step_statistics[step_id].to_dict()}
+            for step_id in sorted(step_statistics)
+        ]
+    }
+    if output_statistics is not None:
+        content['output'] = output_statistics.to_dict()
+    if selection_report:
+        content['selection'] = [{'position': step_id, **selection_report[step_id]}
+                                for step_id in sorted(selection_report)]
+    with open(path, 'w') as file:
+        yaml.safe_dump(content, file, sort_keys=False)
+
+
+def load_step_statistics(path, steps):
+    """
+    Reads the statistics written by save_step_statistics for the pipeline with the given steps.
+    """
+    with open(path, 'r') as file:
+        content = yaml.safe_load(file) or {}
+
+    step_statistics = {}
+    for entry in content.get('steps') or []:
+        step_id = entry['position']
+        if step_id >= len(steps) or steps[step_id][0] != entry['step']:
+            raise ValueError(f"Statistics in {path} do not match the pipeline: no step '{entry['step']}' at position {step_id}")
+        step_statistics[step_id] = statistics_from_dict(entry['statistics'])
+    return step_statistics
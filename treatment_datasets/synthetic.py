@@ -0,0 +1,257 @@
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from utils import DATA_DIR, DATASET_STAGES, get_dataset_paths, load_dataset, load_feature_schema
+
+from .pipeline import PIPELINE_FILE
+from .stats import _to_python
+
+
+PROFILE_FILE = 'profile.yaml'
+
+# Columns with at most this many distinct values are sampled from their value frequencies,
+# columns of strings with more are generated as tokens (e.g. names or case numbers)
+MAX_LEVELS = 1000
+# Numerical columns with at most this many distinct values are sampled like categorical ones
+MAX_DISCRETE = 50
+# Numerical values are rounded to the decimals of the profiled values, up to this many
+MAX_DECIMALS = 6
+# Numerical columns are sampled from this many quantiles (inverse transform sampling)
+N_QUANTILES = 101
+
+
+def profile_column(values, structure_type=None, max_levels=MAX_LEVELS):
+    """
+    Returns the statistics of a column that synthetic values are generated from.
+
+    kind is
+        'categorical': the frequencies of the values (including sentinels such as '?'),
+            for categorical features and columns with at most MAX_DISCRETE distinct values
+            (at most max_levels for strings)
+        'numerical': the quantiles of the values, their dtype and number of decimals, and
+            the frequencies of non-numerical values of numerical features (sentinels)
+        'identifier': more than max_levels integers that are all distinct, generated as a
+            sequence
+        'text': strings with more than max_levels distinct values, generated as tokens
+            with the same ratio of distinct values
+    """
+    n_rows = len(values)
+    missing = values.isna()
+    missing_rate = float(missing.mean()) if n_rows else 0.0
+    present = values[~missing]
+    counts = present.value_counts(sort=False)
+
+    numeric = None
+    if pd.api.types.is_numeric_dtype(present.dtype) and present.dtype.kind != 'b':
+        numeric = present
+    elif structure_type == 'numerical':
+        numeric = pd.to_numeric(present, errors='coerce')
+
+    if numeric is not None and structure_type != 'categorical' and numeric.nunique() > MAX_DISCRETE:
+        sentinels = present[numeric.isna()].value_counts()
+        numeric = numeric.dropna()
+        decimals = _count_decimals(numeric.to_numpy(dtype=np.float64))
+        if numeric.dtype.kind in 'iu' and numeric.is_unique and len(numeric) == n_rows and n_rows > max_levels:
+            return {'kind': 'identifier', 'start': int(numeric.min()), 'missing_rate': missing_rate}
+        quantiles = np.quantile(numeric.to_numpy(dtype=np.float64), np.linspace(0, 1, N_QUANTILES))
+        profile = {'kind': 'numerical', 'quantiles': _to_python(quantiles), 'dtype': numeric.dtype.name,
+                   'decimals': decimals}
+        if len(sentinels):
+            profile['sentinels'] = dict(zip(_to_python(sentinels.index), _to_python(sentinels / n_rows)))
+        profile['missing_rate'] = missing_rate
+        return profile
+
+    if len(counts) > max_levels:
+        return {'kind': 'text', 'unique_ratio': len(counts) / len(present), 'missing_rate': missing_rate}
+    frequencies = counts / max(len(present), 1)
+    return {'kind': 'categorical', 'values': _to_python(counts.index), 'weights': _to_python(frequencies),
+            'missing_rate': missing_rate}
+
+
+def _count_decimals(values, max_decimals=MAX_DECIMALS):
+    # Smallest number of decimals the values are rounded to, None if more than max_decimals
+    for decimals in range(max_decimals + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return decimals
+    return None
+
+
+def profile_dataset(df, schema=None, max_levels=MAX_LEVELS):
+    """
+    Returns the profile of a dataframe: the number of rows and the statistics of each column
+    (see profile_column()), in column order. The structural type of a feature in schema
+    decides whether it is profiled as categorical or numerical, columns that are not in
+    the schema are profiled by their dtype.
+    """
+    columns = {}
+    for column in df.columns:
+        structure_type = schema.get_structural_type(column) if schema is not None else None
+        columns[column] = profile_column(df[column], structure_type, max_levels)
+    return {'n_rows': len(df), 'columns': columns}
+
+
+def schema_profile(schema, seed=0):
+    """
+    Returns a profile for a feature schema without data: categorical features with 2 to 10
+    levels and 2% '?' sentinels, numerical features standard normal, with 5% missing values.
+    """
+    rng = np.random.default_rng(seed)
+    normal_quantiles = np.quantile(rng.standard_normal(100_000), np.linspace(0, 1, N_QUANTILES))
+    columns = {}
+    for feature in schema.feature_to_role:
+        if schema.get_structural_type(feature, 'numerical') == 'categorical':
+            n_levels = int(rng.integers(2, 11))
+            columns[feature] = {
+                'kind': 'categorical',
+                'values': [f'level_{level}' for level in range(n_levels)] + ['?'],
+                'weights': [0.98 / n_levels] * n_levels + [0.02],
+                'missing_rate': 0.0,
+            }
+        else:
+            columns[feature] = {'kind': 'numerical', 'quantiles': _to_python(normal_quantiles), 'dtype': 'float64',
+                                'decimals': None, 'missing_rate': 0.05}
+    return {'n_rows': schema.n_samples, 'columns': columns}
+
+
+def save_profile(path, profile):
+    with open(path, 'w') as file:
+        yaml.safe_dump(profile, file, sort_keys=False, default_flow_style=None)
+
+
+def load_profile(path):
+    with open(path, 'r') as file:
+        return yaml.safe_load(file)
+
+
+def _generate_column(profile, n_rows, start, total_rows, name, rng):
+    kind = profile['kind']
+    if kind == 'categorical':
+        weights = np.asarray(profile['weights'], dtype=np.float64)
+        levels = np.asarray(profile['values'])
+        if levels.dtype.kind in 'US':
+            levels = levels.astype(object)
+        if len(levels):
+            values = levels[rng.choice(len(levels), n_rows, p=weights / weights.sum())]
+        else:
+            # Column without any value
+            values = np.full(n_rows, np.nan)
+    elif kind == 'numerical':
+        quantiles = np.asarray(profile['quantiles'], dtype=np.float64)
+        values = np.interp(rng.random(n_rows) * (len(quantiles) - 1), np.arange(len(quantiles)), quantiles)
+        if profile['decimals'] is not None:
+            values = np.round(values, profile['decimals'])
+        values = values.astype(profile['dtype'])
+        sentinels = profile.get('sentinels')
+        if sentinels:
+            values = values.astype(object)
+            draw = rng.random(n_rows)
+            threshold = 0.0
+            for sentinel, rate in sentinels.items():
+                values[(draw >= threshold) & (draw < threshold + rate)] = sentinel
+                threshold += rate
+    elif kind == 'identifier':
+        values = np.arange(profile['start'] + start, profile['start'] + start + n_rows, dtype=np.int64)
+    elif kind == 'text':
+        n_unique = max(int(round(profile['unique_ratio'] * total_rows)), 1)
+        values = np.char.add(f'{name}_', rng.integers(n_unique, size=n_rows).astype(str)).astype(object)
+    else:
+        raise ValueError(f"Unknown column kind '{kind}' of column '{name}'")
+
+    missing = rng.random(n_rows) < profile['missing_rate']
+    if missing.any():
+        if values.dtype.kind in 'iuf':
+            values = values.astype(np.float64)
+            values[missing] = np.nan
+        else:
+            values = values.astype(object)
+            values[missing] = None
+    return values
+
+
+def generate_chunk(profile, n_rows, seed=0, chunk_id=0, start=0, total_rows=None):
+    """
+    Generates a dataframe of n_rows rows from a profile. The rows are chunk chunk_id of a
+    dataset of total_rows rows and start at row start. Each chunk is generated with its own
+    random generator, seeded by seed and chunk_id, so that the chunks can be generated in
+    any order and in parallel.
+    """
+    rng = np.random.default_rng([seed, chunk_id])
+    total_rows = n_rows if total_rows is None else total_rows
+    return pd.DataFrame({
+        name: _generate_column(column_profile, n_rows, start, total_rows, name, rng)
+        for name, column_profile in profile['columns'].items()
+    })
+
+
+def _chunk_csv(profile, n_rows, seed, chunk_id, start, total_rows):
+    df = generate_chunk(profile, n_rows, seed, chunk_id, start, total_rows)
+    return df.to_csv(header=chunk_id == 0, index=False)
+
+
+def generate_dataset(profile, n_rows, output_path, seed=0, chunksize=100_000, max_workers=1):
+    """
+    Writes a synthetic csv file of n_rows rows generated from a profile, chunk by chunk. The
+    chunks are generated and formatted by max_workers processes and written in order, so the
+    file only depends on the profile, n_rows, seed and chunksize.
+    """
+    chunks = [(chunk_id, start, min(chunksize, n_rows - start))
+              for chunk_id, start in enumerate(range(0, max(n_rows, 1), chunksize))]
+
+    with open(output_path, 'w', newline='') as file:
+        if max_workers <= 1:
+            for chunk_id, start, size in chunks:
+                file.write(_chunk_csv(profile, size, seed, chunk_id, start, n_rows))
+            return n_rows
+
+        # At most two chunks per worker are pending, so that formatted chunks do not pile up
+        # in memory while they wait to be written
+        with ProcessPoolExecutor(max_workers) as executor:
+            pending = deque()
+            for chunk_id, start, size in chunks:
+                pending.append(executor.submit(_chunk_csv, profile, size, seed, chunk_id, start, n_rows))
+                if len(pending) >= 2 * max_workers:
+                    file.write(pending.popleft().result())
+            while pending:
+                file.write(pending.popleft().result())
+    return n_rows
+
+
+def synthesize_dataset(name, n_rows, output_dir, data_dir=DATA_DIR, profile=None, seed=0, chunksize=100_000,
+                       max_workers=1):
+    """
+    Creates the folder output_dir/<name> with a synthetic data.csv of n_rows rows and copies
+    of the feature YAMLs and pipeline of the dataset, so that the synthetic dataset can be
+    built like the original one (with --data-dir output_dir).
+
+    The profile is read from data/<name>/profile.yaml if it exists, otherwise it is computed
+    from the raw csv file of the dataset, or from its feature schema alone if there is none.
+    """
+    source_dir = os.path.join(data_dir, name)
+    target_dir = os.path.join(output_dir, name)
+    if os.path.abspath(source_dir) == os.path.abspath(target_dir):
+        raise ValueError(f"The synthetic dataset would overwrite the data of '{name}'")
+
+    if profile is None:
+        profile_path = os.path.join(source_dir, PROFILE_FILE)
+        csv_path, yaml_path = get_dataset_paths(name, 'raw', data_dir)
+        schema = load_feature_schema(yaml_path) if yaml_path is not None else None
+        if os.path.exists(profile_path):
+            profile = load_profile(profile_path)
+        elif os.path.exists(csv_path):
+            profile = profile_dataset(load_dataset(name, 'raw', data_dir, apply_dtypes=False), schema)
+        elif schema is not None:
+            profile = schema_profile(schema, seed)
+        else:
+            raise ValueError(f"Dataset '{name}' has neither a profile, a raw csv file nor a feature YAML")
+
+    os.makedirs(target_dir, exist_ok=True)
+    for file_name in DATASET_STAGES['raw'][1] + [PIPELINE_FILE]:
+        if os.path.exists(os.path.join(source_dir, file_name)):
+            shutil.copyfile(os.path.join(source_dir, file_name), os.path.join(target_dir, file_name))
+    return generate_dataset(profile, n_rows, os.path.join(target_dir, 'data.csv'), seed, chunksize, max_workers)
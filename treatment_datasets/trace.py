@@ -0,0 +1,293 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+import utils
+
+
+# Tracer of this process, None unless tracing is enabled
+_tracer = None
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes, or None if it is not available
+    (it is read from /proc, i.e. on Linux).
+    """
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm', 'rb') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes, since it started or since
+    the last reset_peak_rss(), or None if it is not available (it is read from /proc, i.e.
+    on Linux).
+    """
+    try:
+        with open('/proc/self/status', 'rb') as file:
+            for line in file:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident set size returned by peak_rss() to the current one, which
+    also resets the ru_maxrss of getrusage(). Returns False if it cannot be reset (it is
+    written to /proc, i.e. on Linux).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def process_peak_rss():
+    # Largest resident set size of this process since it started, in bytes (ru_maxrss is in kB on Linux)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _shape(value):
+    # Shape of a dataframe or series, or of the first one of a tuple (e.g. one_hot_encode)
+    if isinstance(value, tuple):
+        value = next((item for item in value if isinstance(item, (pd.DataFrame, pd.Series))), None)
+    if isinstance(value, pd.DataFrame):
+        return list(value.shape)
+    if isinstance(value, pd.Series):
+        return [len(value), 1]
+    return None
+
+
+class Span:
+    """
+    Measurements of a traced function or step: wall and CPU time, resident set size at the
+    start and end and its peak during the span (None if the peak cannot be reset, see
+    reset_peak_rss()), the peak of the whole process so far, the shape of its input and
+    output dataframes and, if allocations are traced, the peak of the memory it allocated
+    through Python and NumPy.
+
+    Peaks are reset when a span starts, so the peak of a span is the largest of the peak
+    of its own code and the peaks of its nested spans.
+    """
+
+    def __init__(self, tracer, name, category, df=None):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.shape_in = _shape(df)
+        self.shape_out = None
+        self.depth = len(tracer._stack)
+        self.child_peak = 0
+        self.child_peak_rss = 0
+
+    def output(self, value):
+        self.shape_out = _shape(value)
+
+    def _parent(self):
+        # The span enclosing this one, which is on the stack below it
+        return self.tracer._stack[self.depth - 1] if self.depth else None
+
+    def start(self):
+        parent = self._parent()
+        if self.tracer.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.child_peak = max(parent.child_peak, peak)
+            tracemalloc.reset_peak()
+            self.traced_start = current
+        if self.tracer.span_peak_rss:
+            peak = peak_rss() or 0
+            self.tracer.process_peak_rss = max(self.tracer.process_peak_rss, peak)
+            if parent is not None:
+                parent.child_peak_rss = max(parent.child_peak_rss, peak)
+            reset_peak_rss()
+        self.rss_start = current_rss()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter_ns()
+
+    def finish(self):
+        wall_end = time.perf_counter_ns()
+        cpu_end = time.process_time()
+        rss_end = current_rss()
+        parent = self._parent()
+        peak_rss_end = None
+        if self.tracer.span_peak_rss:
+            peak_rss_end = max(peak_rss() or 0, self.child_peak_rss)
+            self.tracer.process_peak_rss = max(self.tracer.process_peak_rss, peak_rss_end)
+            if parent is not None:
+                parent.child_peak_rss = max(parent.child_peak_rss, peak_rss_end)
+        event = {
+            'name': self.name,
+            'category': self.category,
+            'depth': self.depth,
+            'start_us': (self.wall_start - self.tracer.origin_ns) / 1000,
+            'wall_s': (wall_end - self.wall_start) / 1e9,
+            'cpu_s': cpu_end - self.cpu_start,
+            'rss_bytes': rss_end,
+            'rss_delta_bytes': rss_end - self.rss_start if rss_end is not None and self.rss_start is not None else None,
+            'peak_rss_bytes': peak_rss_end,
+            'process_peak_rss_bytes': self.tracer.process_peak_rss if self.tracer.span_peak_rss else process_peak_rss(),
+            'rows_in': self.shape_in[0] if self.shape_in else None,
+            'columns_in': self.shape_in[1] if self.shape_in else None,
+            'rows_out': self.shape_out[0] if self.shape_out else None,
+            'columns_out': self.shape_out[1] if self.shape_out else None,
+        }
+        if self.tracer.trace_allocations:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            event['allocated_bytes'] = peak - self.traced_start
+            if parent is not None:
+                parent.child_peak = max(parent.child_peak, peak)
+        return event
+
+
+class Tracer:
+    """
+    Collects the spans of instrumented utils functions and pipeline steps and the warnings
+    printed by them while it is enabled (see tracing()).
+
+    Parameters:
+    -----------
+    trace_allocations : bool
+        If True, the memory allocated by each span is measured with tracemalloc, which
+        slows the traced code down considerably
+    """
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = trace_allocations
+        # Whether the peak resident set size can be reset at the start of each span. As this
+        # resets ru_maxrss as well, the peak of the process is then kept by the tracer
+        self.process_peak_rss = process_peak_rss()
+        self.span_peak_rss = reset_peak_rss()
+        self.origin_ns = time.perf_counter_ns()
+        self.spans = []
+        self.warnings = []
+        self._stack = []
+        self._thread = threading.get_ident()
+
+    @contextmanager
+    def span(self, name, category, df=None):
+        """
+        Context manager measuring the code it encloses. It yields the Span, whose output()
+        records the shape of the result.
+        """
+        span = Span(self, name, category, df)
+        self._stack.append(span)
+        span.start()
+        try:
+            yield span
+        finally:
+            self._stack.pop()
+            self.spans.append(span.finish())
+
+    def call(self, function, args, kwargs):
+        # Instrumentation hook of the utils functions
+        if threading.get_ident() != self._thread:
+            return function(*args, **kwargs)
+        df = next((arg for arg in args if isinstance(arg, (pd.DataFrame, pd.Series))), None)
+        with self.span(function.__name__, 'utils', df) as span:
+            result = function(*args, **kwargs)
+            span.output(result)
+        return result
+
+    def warning(self, message):
+        self.warnings.append({
+            'time_us': (time.perf_counter_ns() - self.origin_ns) / 1000,
+            'span': self._stack[-1].name if self._stack else None,
+            'message': message,
+        })
+
+    def to_dict(self):
+        return {'pid': os.getpid(), 'spans': self.spans, 'warnings': self.warnings}
+
+
+def enable_tracing(tracer):
+    global _tracer
+    if tracer.trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _tracer = tracer
+    utils.set_instrumentation_hooks(tracer.call, tracer.warning)
+
+
+def disable_tracing():
+    global _tracer
+    if _tracer is not None and _tracer.trace_allocations:
+        tracemalloc.stop()
+    _tracer = None
+    utils.set_instrumentation_hooks()
+
+
+@contextmanager
+def tracing(trace_allocations=False):
+    """
+    Enables tracing in this process for the enclosed code and yields the Tracer.
+    """
+    tracer = Tracer(trace_allocations)
+    enable_tracing(tracer)
+    try:
+        yield tracer
+    finally:
+        disable_tracing()
+
+
+def span(name, category, df=None):
+    """
+    Returns tracer.span() of the enabled tracer, or a context manager doing nothing (and
+    yielding None) if tracing is disabled.
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, category, df)
+
+
+def save_trace(path, traces):
+    """
+    Writes a JSON trace with the spans and warnings of the traces (Tracer.to_dict() of one or
+    several processes), each with a label, e.g. the dataset name: {label: trace}.
+    """
+    with open(path, 'w') as file:
+        json.dump(traces, file, indent=1)
+
+
+def save_chrome_trace(path, traces):
+    """
+    Writes the traces (see save_trace()) in the Chrome trace event format, which can be
+    opened in chrome://tracing, Perfetto or speedscope. Each label is shown as a process.
+    """
+    events = []
+    for process_id, (label, trace) in enumerate(traces.items()):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': process_id, 'tid': 0,
+                       'args': {'name': f"{label} (pid {trace['pid']})"}})
+        for event in trace['spans']:
+            args = {key: value for key, value in event.items() if key not in ('name', 'category', 'start_us', 'depth')}
+            events.append({'name': event['name'], 'cat': event['category'], 'ph': 'X', 'pid': process_id,
+                           'tid': 0, 'ts': event['start_us'], 'dur': event['wall_s'] * 1e6, 'args': args})
+        for warning in trace['warnings']:
+            events.append({'name': 'warning', 'cat': 'warning', 'ph': 'i', 's': 't', 'pid': process_id, 'tid': 0,
+                           'ts': warning['time_us'], 'args': {'message': warning['message']}})
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
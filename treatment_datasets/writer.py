@@ -0,0 +1,190 @@
+import gzip
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils import DATA_DIR, get_dataset_paths
+
+from . import trace
+
+
+CHUNKSIZE = 100_000
+LINE_TERMINATOR = os.linesep.encode()
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def _is_digit_column(values):
+    # Integer columns with values 0 to 9 (e.g. one-hot indicators) are written as one byte per cell
+    return values.dtype.kind in 'iu' and len(values) and values.min() >= 0 and values.max() <= 9
+
+
+def _format_digits(block):
+    # Rows of a block of digit columns as fixed width byte strings, without formatting each cell
+    n_rows, n_columns = block.shape
+    characters = np.full((n_rows, 2 * n_columns - 1), ord(','), dtype=np.uint8)
+    characters[:, ::2] = block + ord('0')
+    return characters.view(f'S{2 * n_columns - 1}').ravel()
+
+
+def _format_values(values, float_precision):
+    # Values of a numerical column as byte strings, formatted like DataFrame.to_csv()
+    if values.dtype.kind != 'f':
+        return values.astype(bytes)
+    if float_precision is not None:
+        values = np.round(values, float_precision)
+    formatted = values.astype('S32')
+    formatted[np.isnan(values)] = b''
+    return formatted
+
+
+def format_csv(df, header=True, float_precision=None):
+    """
+    Formats a dataframe as csv, like df.to_csv(index=False) (of df.round(float_precision)
+    if float_precision is given), and returns the bytes.
+
+    Frames whose columns all have a numpy bool, integer or float dtype, such as
+    preprocessed datasets, are formatted column-wise with numpy: runs of consecutive
+    integer columns with values 0 to 9 (one-hot indicators) are written as fixed width
+    rows and floats with their shortest representation. Other frames are written with
+    DataFrame.to_csv().
+    """
+    header_bytes = df.iloc[:0].to_csv(index=False, lineterminator=os.linesep).encode() if header else b''
+    numerical = all(isinstance(dtype, np.dtype) and dtype.kind in 'biuf' for dtype in df.dtypes)
+    # A missing value of a single column frame is written as "" by to_csv
+    if not numerical or df.shape[1] < 2:
+        df = df.round(float_precision) if float_precision is not None else df
+        return header_bytes + df.to_csv(header=False, index=False, lineterminator=os.linesep).encode()
+    if not len(df):
+        return header_bytes
+
+    segments = []
+    digit_block = []
+    for column in range(df.shape[1]):
+        values = df.iloc[:, column].to_numpy()
+        if _is_digit_column(values):
+            digit_block.append(values)
+            continue
+        if digit_block:
+            segments.append(_format_digits(np.column_stack(digit_block)))
+            digit_block = []
+        segments.append(_format_values(values, float_precision))
+    if digit_block:
+        segments.append(_format_digits(np.column_stack(digit_block)))
+
+    rows = zip(*(segment.tolist() for segment in segments))
+    return header_bytes + LINE_TERMINATOR.join(map(b','.join, rows)) + LINE_TERMINATOR
+
+
+def _open(path, compression, compression_level):
+    if compression == 'infer':
+        compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+    if compression is None:
+        return open(path, 'wb')
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=9 if compression_level is None else compression_level)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the zstandard package") from None
+        compressor = zstandard.ZstdCompressor(level=3 if compression_level is None else compression_level)
+        return compressor.stream_writer(open(path, 'wb'), closefd=True)
+    raise ValueError(f"Unknown compression '{compression}', expected one of {[None] + list(COMPRESSIONS.values())}")
+
+
+class CsvWriter:
+    """
+    Writes dataframes to a csv file, chunk by chunk (see format_csv()). The header is
+    written with the first chunk, so the file is the same as writing all chunks at once
+    with to_csv(index=False).
+
+    With an executor (e.g. a ProcessPoolExecutor), chunks are formatted in parallel and
+    written in order. At most two chunks per worker are pending, so that formatted chunks
+    do not pile up in memory while they wait to be written.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the csv file
+    float_precision : int, optional
+        Number of decimals floats are rounded to, by default they are written in full
+    compression : str, optional
+        'gzip' or 'zstd' (needs the zstandard package), 'infer' to choose it from the
+        extension of path (.gz, .zst)
+    compression_level : int, optional
+        Compression level, by default 9 for gzip and 3 for zstd
+    chunksize : int
+        Number of rows formatted at once
+    executor : concurrent.futures.Executor, optional
+        Executor formatting the chunks
+    """
+
+    def __init__(self, path, float_precision=None, compression='infer', compression_level=None,
+                 chunksize=CHUNKSIZE, executor=None):
+        self.float_precision = float_precision
+        self.chunksize = chunksize
+        self.executor = executor
+        self.max_pending = 2 * getattr(executor, '_max_workers', 1)
+        self.header = True
+        self.n_rows = 0
+        self._pending = deque()
+        self._file = _open(path, compression, compression_level)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, df):
+        """
+        Appends the rows of a dataframe.
+        """
+        for start in range(0, max(len(df), 1), self.chunksize):
+            chunk = df.iloc[start:start + self.chunksize]
+            if self.executor is None:
+                with trace.span('format_csv', 'io', chunk):
+                    self._file.write(format_csv(chunk, self.header, self.float_precision))
+            else:
+                self._pending.append(self.executor.submit(format_csv, chunk, self.header, self.float_precision))
+                if len(self._pending) >= self.max_pending:
+                    self._file.write(self._pending.popleft().result())
+            self.header = False
+        self.n_rows += len(df)
+
+    def close(self):
+        try:
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._file.close()
+
+
+def write_csv(df, path, float_precision=None, compression='infer', compression_level=None, chunksize=CHUNKSIZE,
+              executor=None):
+    """
+    Writes a dataframe to a csv file with CsvWriter, like df.to_csv(path, index=False).
+    """
+    with CsvWriter(path, float_precision, compression, compression_level, chunksize, executor) as writer:
+        writer.write(df)
+
+
+def export_csv(name, output_path, data_dir=DATA_DIR, float_precision=None, compression='infer',
+               compression_level=None, chunksize=CHUNKSIZE, executor=None):
+    """
+    Writes data_preprocessed.csv of a dataset to output_path, e.g. with fewer decimals or
+    compressed, reading it chunk by chunk.
+
+    Returns:
+    --------
+    int
+        Number of rows written
+    """
+    csv_path, _ = get_dataset_paths(name, 'preprocessed', data_dir)
+    with CsvWriter(output_path, float_precision, compression, compression_level, chunksize, executor) as writer, \
+            pd.read_csv(csv_path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            writer.write(chunk)
+    return writer.n_rows
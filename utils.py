@@ -1,8 +1,436 @@
+import hashlib
+import importlib.util
+import json
+import os
+from functools import lru_cache, wraps
+
 import pandas as pd
 import numpy as np
 import yaml
 
+try:
+    # LibYAML bindings are several times faster than the pure Python loader
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+FAIRNESS_ROLES = ['sensitive', 'covariate', 'treatment', 'target', 'other']
+STRUCTURAL_TYPES = ['numerical', 'categorical']
+
+
+# Instrumentation hooks (see treatment_datasets.trace), None unless tracing is enabled. While
+# set, instrumented functions are called through _call_hook(function, args, kwargs) and
+# warnings are passed to _warning_hook(message) instead of being printed.
+_call_hook = None
+_warning_hook = None
+
+
+def set_instrumentation_hooks(call_hook=None, warning_hook=None):
+    global _call_hook, _warning_hook
+    _call_hook = call_hook
+    _warning_hook = warning_hook
+
+
+def instrumented(function):
+    """
+    Decorator that lets the instrumentation hook time a function. Without hook the only
+    cost is one check per call.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if _call_hook is None:
+            return function(*args, **kwargs)
+        return _call_hook(function, args, kwargs)
+    return wrapper
+
+
+def warn(message):
+    """
+    Prints a warning, or passes it to the instrumentation hook while tracing is enabled.
+    """
+    if _warning_hook is not None:
+        _warning_hook(message)
+    else:
+        print(f"Warning: {message}")
+
+
+class FeatureSchema:
+    """
+    Parsed representation of a features YAML file (see features_schema.yaml).
+
+    The YAML is parsed once and indexed by feature name, so that looking up the
+    fairness role or the structural type of a feature does not require scanning
+    the feature lists. Instances are shared through load_feature_schema() and
+    should be treated as read-only.
+
+    Attributes:
+    -----------
+    name : str
+        Name of the dataset
+    n_samples : int
+        Number of samples declared in the YAML
+    fairness : dict
+        Mapping from fairness role (e.g. 'sensitive') to list of feature names
+    structural : dict
+        Mapping from structural type ('numerical', 'categorical') to list of feature names
+    feature_to_role : dict
+        Mapping from feature name to its first fairness role (in FAIRNESS_ROLES order)
+    feature_to_type : dict
+        Mapping from feature name to its first structural type
+    """
+
+    def __init__(self, yaml_data):
+        dataset = (yaml_data or {}).get('dataset') or {}
+        self.name = dataset.get('name')
+        self.n_samples = dataset.get('n_samples')
+        self.fairness = self._extract_features(dataset.get('fairness'))
+        self.structural = self._extract_features(dataset.get('structural'))
+
+        self.feature_to_role = {}
+        for role in FAIRNESS_ROLES:
+            for feature in self.fairness.get(role, []):
+                self.feature_to_role.setdefault(feature, role)
+
+        self.feature_to_type = {}
+        for structure_type in STRUCTURAL_TYPES:
+            for feature in self.structural.get(structure_type, []):
+                self.feature_to_type.setdefault(feature, structure_type)
+
+    @staticmethod
+    def _extract_features(section):
+        # A group is either missing, has no 'features' key or has an empty 'features' entry
+        features = {}
+        for group, content in (section or {}).items():
+            if isinstance(content, dict) and content.get('features'):
+                features[group] = list(content['features'])
+            else:
+                features[group] = []
+        return features
+
+    def get_features(self, role, columns=None):
+        """
+        Returns the features of a fairness role, optionally restricted to the given columns.
+        """
+        features = self.fairness.get(role, [])
+        if columns is None:
+            return list(features)
+        columns = set(columns)
+        return [feature for feature in features if feature in columns]
+
+    def get_structural_features(self, structure_type, columns=None):
+        """
+        Returns the features of a structural type, optionally restricted to the given columns.
+        """
+        features = self.structural.get(structure_type, [])
+        if columns is None:
+            return list(features)
+        columns = set(columns)
+        return [feature for feature in features if feature in columns]
+
+    def get_role(self, feature, default=None):
+        return self.feature_to_role.get(feature, default)
+
+    def get_structural_type(self, feature, default=None):
+        return self.feature_to_type.get(feature, default)
+
+    def ordered_features(self, columns):
+        """
+        Returns the given columns that are part of the fairness taxonomy, ordered by
+        role (sensitive, covariate, treatment, target, other) and by YAML order within a role.
+        """
+        columns = set(columns)
+        ordered_features = []
+        for role in FAIRNESS_ROLES:
+            ordered_features += [feature for feature in self.fairness.get(role, []) if feature in columns]
+        return ordered_features
+
+
+# Schemas loaded from files, keyed by absolute path: (mtime_ns, size, FeatureSchema)
+_schema_cache = {}
+
+
+@lru_cache(maxsize=32)
+def _load_feature_schema_from_string(yaml_string):
+    return FeatureSchema(yaml.load(yaml_string, Loader=_YamlLoader))
+
+
+def load_feature_schema(yaml_path=None, yaml_string=None):
+    """
+    Load a FeatureSchema from a YAML file or string.
+    
+    Schemas are memoized: a file is parsed again only if its modification time
+    or size changed since the last call.
+    
+    Parameters:
+    yaml_path (str, optional): Path to the YAML file with feature definitions
+    yaml_string (str, optional): String containing YAML content
+    
+    Returns:
+    FeatureSchema: The parsed schema
+    """
+    if yaml_path:
+        path = os.path.abspath(yaml_path)
+        stat = os.stat(path)
+        cached = _schema_cache.get(path)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        with open(path, 'r') as file:
+            schema = FeatureSchema(yaml.load(file, Loader=_YamlLoader))
+        _schema_cache[path] = (stat.st_mtime_ns, stat.st_size, schema)
+        return schema
+    elif yaml_string:
+        return _load_feature_schema_from_string(yaml_string)
+    else:
+        raise ValueError("Either yaml_path or yaml_string must be provided")
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# File names of each dataset stage: (csv file, candidate feature YAML files)
+DATASET_STAGES = {
+    'raw': ('data.csv', ['features_raw.yaml', 'features.yaml']),
+    'preprocessed': ('data_preprocessed.csv', ['features_preprocessed.yaml']),
+}
+
+# Parquet keeps the dtypes (including categoricals) and is fast to read, but needs pyarrow
+CACHE_FORMAT = 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pickle'
+
+
+def get_dataset_paths(name, stage='raw', data_dir=DATA_DIR):
+    """
+    Returns the paths of the csv file and of the feature YAML file (None if there is none)
+    of a dataset stage.
+    """
+    if stage not in DATASET_STAGES:
+        raise ValueError(f"Unknown stage '{stage}', expected one of {list(DATASET_STAGES)}")
+
+    csv_name, yaml_names = DATASET_STAGES[stage]
+    dataset_dir = os.path.join(data_dir, name)
+    yaml_path = None
+    for yaml_name in yaml_names:
+        if os.path.exists(os.path.join(dataset_dir, yaml_name)):
+            yaml_path = os.path.join(dataset_dir, yaml_name)
+            break
+
+    return os.path.join(dataset_dir, csv_name), yaml_path
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_feature_names(features, columns):
+    """
+    Returns the column names of features listed by a feature YAML file: raw YAML files list
+    feature names, preprocessed ones list column indexes. Features that are not among the
+    columns are left out.
+    
+    Parameters:
+    -----------
+    features : list
+        Feature names or column indexes, e.g. of FeatureSchema.get_features
+    columns : list
+        Columns of the dataset, in file order
+    
+    Returns:
+    --------
+    list
+        Names of the features among the columns, in the order of features
+    """
+    column_set = set(columns)
+    names = []
+    for feature in features:
+        if isinstance(feature, int) and not isinstance(feature, bool):
+            if 0 <= feature < len(columns):
+                names.append(columns[feature])
+        elif feature in column_set:
+            names.append(feature)
+    return names
+
+
+@instrumented
+def apply_schema_dtypes(df, schema, schema_columns=None):
+    """
+    Converts the columns of a dataframe to the dtypes declared by a feature schema.
+    
+    Categorical features become 'category'. Numerical float features become float32
+    when this does not change any value; other numerical features are left untouched.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The dataframe to convert
+    schema : FeatureSchema
+        Schema of the dataframe
+    schema_columns : list, optional
+        All columns of the dataset, which the column indexes of a preprocessed schema
+        refer to, if df only has some of them
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Dataframe with converted dtypes
+    """
+    columns = list(df.columns)
+    if schema_columns is None:
+        schema_columns = columns
+    column_set = set(columns)
+    dtypes = {}
+
+    for feature in resolve_feature_names(schema.get_structural_features('numerical'), schema_columns):
+        if feature not in column_set:
+            continue
+        values = df[feature]
+        if values.dtype == np.float64:
+            values_float32 = values.to_numpy().astype(np.float32)
+            if np.array_equal(values_float32.astype(np.float64), values.to_numpy(), equal_nan=True):
+                dtypes[feature] = np.float32
+
+    for feature in resolve_feature_names(schema.get_structural_features('categorical'), schema_columns):
+        if feature in column_set and not isinstance(df[feature].dtype, pd.CategoricalDtype):
+            dtypes[feature] = 'category'
+
+    if not dtypes:
+        return df
+    return df.astype(dtypes)
+
+
+def _cache_paths(csv_path):
+    cache_dir = os.path.join(os.path.dirname(csv_path), '.cache')
+    base_name = os.path.splitext(os.path.basename(csv_path))[0]
+    return (os.path.join(cache_dir, f"{base_name}.{CACHE_FORMAT}"),
+            os.path.join(cache_dir, f"{base_name}.json"))
+
+
+def _read_cache_metadata(metadata_path):
+    try:
+        with open(metadata_path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_cache_valid(metadata, csv_path, csv_stat, yaml_fingerprint, apply_dtypes):
+    if metadata is None or metadata.get('format') != CACHE_FORMAT:
+        return False
+    if metadata.get('schema') != yaml_fingerprint or metadata.get('apply_dtypes') != apply_dtypes:
+        return False
+    if metadata.get('size') != csv_stat.st_size:
+        return False
+    if metadata.get('mtime_ns') == csv_stat.st_mtime_ns:
+        return True
+    # The file was touched (e.g. by a checkout), only its content matters
+    return metadata.get('sha256') == file_hash(csv_path)
+
+
+def _read_csv_columns(csv_path, schema, columns=None):
+    # Parses the csv file, or only the given columns of it (in the given order)
+    if columns is None:
+        df = pd.read_csv(csv_path)
+        return apply_schema_dtypes(df, schema) if schema is not None else df
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    df = pd.read_csv(csv_path, usecols=columns)[columns]
+    return apply_schema_dtypes(df, schema, header) if schema is not None else df
+
+
+@instrumented
+def load_dataset(name, stage='raw', data_dir=DATA_DIR, use_cache=True, apply_dtypes=True, columns=None):
+    """
+    Loads the csv file of a dataset through a typed columnar cache.
+    
+    On the first read the csv file is parsed, the dtypes declared by the feature YAML
+    are applied (see apply_schema_dtypes) and the result is written to
+    data/<name>/.cache/ as Parquet (or as pickle if pyarrow is not installed).
+    Later calls read the cache as long as the size, modification time and hash of the
+    csv file and the feature YAML are unchanged.
+    
+    With columns, only these columns are read: from the Parquet cache if it is valid,
+    otherwise they are parsed from the csv file (usecols) without writing the cache.
+    
+    Parameters:
+    -----------
+    name : str
+        Name of the dataset, i.e. its folder in data_dir
+    stage : str
+        'raw' for data.csv or 'preprocessed' for data_preprocessed.csv
+    data_dir : str
+        Directory containing the dataset folders
+    use_cache : bool
+        If False, the csv file is parsed and no cache is read or written
+    apply_dtypes : bool
+        If True, the dtypes declared by the feature YAML are applied
+    columns : list, optional
+        Names of the columns to load, by default all of them
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        The dataset
+    """
+    csv_path, yaml_path = get_dataset_paths(name, stage, data_dir)
+    schema = load_feature_schema(yaml_path) if yaml_path and apply_dtypes else None
+
+    if columns is not None:
+        columns = list(columns)
+    if not use_cache:
+        return _read_csv_columns(csv_path, schema, columns)
+
+    cache_path, metadata_path = _cache_paths(csv_path)
+    csv_stat = os.stat(csv_path)
+    yaml_fingerprint = file_hash(yaml_path) if yaml_path and apply_dtypes else None
+
+    metadata = _read_cache_metadata(metadata_path)
+    if os.path.exists(cache_path) and _is_cache_valid(metadata, csv_path, csv_stat, yaml_fingerprint, apply_dtypes):
+        if metadata['mtime_ns'] != csv_stat.st_mtime_ns:
+            metadata['mtime_ns'] = csv_stat.st_mtime_ns
+            with open(metadata_path, 'w') as file:
+                json.dump(metadata, file)
+        if CACHE_FORMAT == 'pickle':
+            df = pd.read_pickle(cache_path)
+            return df if columns is None else df[columns]
+        df = pd.read_parquet(cache_path, columns=columns)
+        # Parquet only restores categoricals with string categories
+        restore = [col for col in metadata['categorical']
+                   if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)]
+        return df.astype({col: 'category' for col in restore}) if restore else df
 
+    if columns is not None:
+        # The cache holds all columns, so it is only written by a full read
+        return _read_csv_columns(csv_path, schema, columns)
+    df = _read_csv_columns(csv_path, schema)
+
+    # Write to a temporary file of this process first so that neither an interrupted run
+    # nor processes loading the same dataset concurrently leave a broken cache
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    if CACHE_FORMAT == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+    with open(metadata_path, 'w') as file:
+        json.dump({
+            'format': CACHE_FORMAT,
+            'size': csv_stat.st_size,
+            'mtime_ns': csv_stat.st_mtime_ns,
+            'sha256': file_hash(csv_path),
+            'schema': yaml_fingerprint,
+            'apply_dtypes': apply_dtypes,
+            'categorical': [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)],
+        }, file)
+
+    return df
+
+
+@instrumented
 def create_yaml_structure(df, fairness_dict, structural_dict, name):
     """
     Creates a YAML-compatible dictionary structure for a dataset with fairness and structural information,
@@ -40,17 +468,17 @@ def create_yaml_structure(df, fairness_dict, structural_dict, name):
     features_excluded_from_structural = [feat for feat in df.columns if feat not in structural_features]
     
     # Identify features not in either taxonomy
-    features_completely_ignored = [feat for feat in df.columns if feat not in fairness_features and feat not in structural_features]
+    features_completely_ignored = [feat for feat in features_excluded_from_fairness if feat not in structural_features]
     
     # Print appropriate warnings
-    if features_excluded_from_structural and not all(f in fairness_features for f in features_excluded_from_structural):
-        print(f"Warning: The following features of dataframe are not in the dictionary and will be excluded from structural taxonomy in YAML: {features_excluded_from_structural}")
+    if features_excluded_from_structural and not fairness_features.issuperset(features_excluded_from_structural):
+        warn(f"The following features of dataframe are not in the dictionary and will be excluded from structural taxonomy in YAML: {features_excluded_from_structural}")
     
-    if features_excluded_from_fairness and not all(f in structural_features for f in features_excluded_from_fairness):
-        print(f"Warning: The following features of dataframe are not in the dictionary and will be excluded from fairness taxonomy in YAML: {features_excluded_from_fairness}")
+    if features_excluded_from_fairness and not structural_features.issuperset(features_excluded_from_fairness):
+        warn(f"The following features of dataframe are not in the dictionary and will be excluded from fairness taxonomy in YAML: {features_excluded_from_fairness}")
     
     if features_completely_ignored:
-        print(f"Warning: The following features of dataframe are not in any of the dictionaries and will be completely ignored in YAML: {features_completely_ignored}")
+        warn(f"The following features of dataframe are not in any of the dictionaries and will be completely ignored in YAML: {features_completely_ignored}")
     
     # Initialize the YAML structure
     yaml_structure = {
@@ -91,21 +519,21 @@ def create_yaml_structure(df, fairness_dict, structural_dict, name):
     # Fill the structural section with indices
     for structure_type, features in structural_dict.items():
         # Filter to only include features that exist in the dataframe and convert to indices
-        valid_indices = [feature_to_index[feat] for feat in features if feat in df.columns]
+        valid_indices = [feature_to_index[feat] for feat in features if feat in feature_to_index]
         yaml_structure["dataset"]["structural"][structure_type]["features"] = valid_indices
         yaml_structure["dataset"]["structural"][structure_type]["num"] = len(valid_indices)
     
     # Fill the fairness section with indices
     for fairness_type, features in fairness_dict.items():
         # Filter to only include features that exist in the dataframe and convert to indices
-        valid_features = [feat for feat in features if feat in df.columns]
-        valid_indices = [feature_to_index[feat] for feat in valid_features]
+        valid_indices = [feature_to_index[feat] for feat in features if feat in feature_to_index]
         yaml_structure["dataset"]["fairness"][fairness_type]["features"] = valid_indices
         yaml_structure["dataset"]["fairness"][fairness_type]["num"] = len(valid_indices)
     
     return yaml_structure
 
 
+@instrumented
 def reorder_columns_by_dict(df, feature_dict):
     """
     Reorders the columns of a dataframe based on the order of values in a dictionary.
@@ -129,42 +557,135 @@ def reorder_columns_by_dict(df, feature_dict):
         ordered_columns.extend(category)
     
     # Check if all columns in ordered_columns exist in df
-    missing_columns = [col for col in ordered_columns if col not in df.columns]
+    df_columns = set(df.columns)
+    missing_columns = [col for col in ordered_columns if col not in df_columns]
     if missing_columns:
         raise ValueError(f"Columns not found in dataframe: {missing_columns}")
     
     # Identify columns in df that are not in ordered_columns
-    extra_columns = [col for col in df.columns if col not in ordered_columns]
+    ordered_set = set(ordered_columns)
+    extra_columns = [col for col in df.columns if col not in ordered_set]
     if extra_columns:
-        print(f"Warning: The following columns of dataframe were not in the dictionary and will be ignored: {extra_columns}")
+        warn(f"The following columns of dataframe were not in the dictionary and will be ignored: {extra_columns}")
     
     # Return the dataframe with only the columns that are in the dictionary, in the specified order
     # Filter out columns that don't exist in the dataframe
-    valid_columns = [col for col in ordered_columns if col in df.columns]
+    valid_columns = [col for col in ordered_columns if col in df_columns]
     
     return df[valid_columns]
 
+@instrumented
 def get_features_type_info(df):
-    # Create empty lists to store information
-    column_names = []
-    data_types = []
-    unique_counts = []
-    
-    # Iterate through each column
-    for column in df.columns:
-        column_names.append(column)
-        data_types.append(str(df[column].dtype))
-        unique_counts.append(df[column].nunique())
-    
-    # Create a DataFrame with the analysis
+    # Data types and numbers of unique values of all columns at once
     analysis_df = pd.DataFrame({
-        'feature': column_names,
-        'data_type': data_types,
-        'nunique_values': unique_counts
+        'feature': df.columns,
+        'data_type': df.dtypes.astype(str).to_numpy(),
+        'nunique_values': df.nunique().to_numpy(),
     })
     
     return analysis_df
 
+
+# Signed and unsigned integer dtypes, from smallest to largest
+_INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+_UNSIGNED_DTYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+
+def _smallest_integer_dtype(values, unsigned=False):
+    # Signed integers stay signed unless unsigned is True, since arithmetic on unsigned
+    # columns (e.g. a difference of two columns) wraps around instead of going negative
+    if len(values) == 0:
+        return values.dtype
+    low, high = values.min(), values.max()
+    candidates = _UNSIGNED_DTYPES if values.dtype.kind == 'u' or unsigned and low >= 0 else _INTEGER_DTYPES
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return values.dtype
+
+
+@instrumented
+def optimize_dtypes(df, yaml_path=None, yaml_string=None, float_tolerance=0.0, max_category_ratio=0.5,
+                    unsigned=False):
+    """
+    Downcasts the columns of a dataframe to compact dtypes, in one pass over the columns:
+    integers to the smallest integer type of the same signedness holding their range
+    (unsigned for non-negative columns if unsigned is True), float64 to float32 when no
+    value changes by more than float_tolerance (relative), and columns of strings to
+    'category' if they are categorical features of the YAML or, for columns not declared
+    numerical, have at most max_category_ratio unique values per row.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The dataframe to convert
+    yaml_path (str, optional): Path to the YAML file with feature definitions
+    yaml_string (str, optional): String containing YAML content
+    float_tolerance : float
+        Largest relative change of a value allowed by the float32 conversion, 0 for lossless
+    max_category_ratio : float
+        Largest number of unique values per row of string columns converted to 'category'
+    unsigned : bool
+        If True, signed integer columns without negative values are converted to unsigned
+        types, on which e.g. df.end - df.start or -df.x wrap around instead of going negative
+    
+    Returns:
+    --------
+    tuple
+        The converted dataframe and a dataframe reporting, for each column, the dtype and
+        the memory in bytes before and after the conversion and the bytes saved
+    """
+    schema = load_feature_schema(yaml_path, yaml_string) if yaml_path or yaml_string else None
+    return downcast_dtypes(df, schema, float_tolerance, max_category_ratio, unsigned)
+
+
+@instrumented
+def downcast_dtypes(df, schema=None, float_tolerance=0.0, max_category_ratio=0.5, unsigned=False):
+    """
+    optimize_dtypes() with a FeatureSchema (see load_feature_schema) instead of a YAML.
+    """
+    dtypes = {}
+
+    for column in df.columns:
+        values = df[column]
+        dtype = values.dtype
+        structure_type = schema.get_structural_type(column) if schema is not None else None
+
+        if isinstance(dtype, pd.CategoricalDtype) or dtype.kind == 'b':
+            continue
+        if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+            target = _smallest_integer_dtype(values.to_numpy(), unsigned)
+            if target != dtype:
+                dtypes[column] = target
+        elif dtype == np.float64:
+            array = values.to_numpy()
+            converted = array.astype(np.float32).astype(np.float64)
+            if float_tolerance:
+                close = np.allclose(converted, array, rtol=float_tolerance, atol=0.0, equal_nan=True)
+            else:
+                close = np.array_equal(converted, array, equal_nan=True)
+            if close:
+                dtypes[column] = np.float32
+        elif structure_type != 'numerical' and pd.api.types.is_string_dtype(dtype):
+            if structure_type == 'categorical' or values.nunique() <= max_category_ratio * len(values):
+                dtypes[column] = 'category'
+
+    optimized = df.astype(dtypes) if dtypes else df
+
+    bytes_before = df.memory_usage(index=False, deep=True)
+    bytes_after = optimized.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'feature': df.columns,
+        'dtype_before': df.dtypes.astype(str).to_numpy(),
+        'dtype_after': optimized.dtypes.astype(str).to_numpy(),
+        'bytes_before': bytes_before.to_numpy(),
+        'bytes_after': bytes_after.to_numpy(),
+    })
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+
+    return optimized, report
+
 def display_dataframe_info(df):
     # Print the shape of the DataFrame
     print(f"DataFrame shape: {df.shape} (rows, columns)")
@@ -177,63 +698,107 @@ def display_dataframe_info(df):
     display(df.head())
 
 
-def calculate_nan_percentage_of_grouped_features(df, yaml_path=None, yaml_string=None):
+# Values that encode a missing value in the raw csv files
+MISSING_VALUE_SENTINELS = ('?', 'Unknown/Invalid', 'N/A')
+
+
+def _count_missing(values, sentinels):
+    # Number of null values and of sentinels of a column, counted together where the dtype allows it
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Null values have code -1, sentinels are looked up among the categories
+        counts = np.bincount(values.cat.codes.to_numpy() + 1, minlength=len(dtype.categories) + 1)
+        return counts[0], counts[1:][dtype.categories.isin(sentinels)].sum()
+    if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        return np.isnan(values.to_numpy()).sum(), 0
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iub':
+        return 0, 0
+    if getattr(dtype, 'storage', None) == 'pyarrow' and pd.api.types.is_string_dtype(dtype):
+        # The null count of an Arrow array is stored with it
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        array = pa.array(values.array)
+        text_sentinels = [sentinel for sentinel in sentinels if isinstance(sentinel, str)]
+        if not text_sentinels:
+            return array.null_count, 0
+        value_set = pa.array(text_sentinels, type=array.type)
+        return array.null_count, pc.sum(pc.is_in(array, value_set=value_set)).as_py() or 0
+    if dtype == object:
+        # Null values have code -1, sentinels are looked up among the distinct values
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        return counts[0], counts[1:][pd.Index(uniques, dtype=object).isin(sentinels)].sum()
+    if pd.api.types.is_string_dtype(dtype):
+        # Strings stored as Python objects: the null mask is kept with the values and is
+        # cheaper to count than factorizing them
+        return values.isna().sum(), values.isin(sentinels).sum()
+    return values.isna().sum(), 0
+
+
+@instrumented
+def profile_missing_values(df, sentinels=MISSING_VALUE_SENTINELS):
+    """
+    Counts the missing values of each column without copying or modifying the dataframe.
+    
+    A value is missing if it is null (NaN, None, pd.NA) or equal to one of the sentinels.
+    Only text and categorical columns are checked for sentinels.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input dataframe
+    sentinels : iterable
+        Values that are counted as missing
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame with one row per column and the columns 'Feature', 'Null_Count',
+        'Sentinel_Count', 'Missing_Count' and 'Missing_Percentage'
+    """
+    sentinels = list(sentinels)
+    null_counts = np.zeros(len(df.columns), dtype=np.int64)
+    sentinel_counts = np.zeros(len(df.columns), dtype=np.int64)
+    for position in range(len(df.columns)):
+        null_counts[position], sentinel_counts[position] = _count_missing(df.iloc[:, position], sentinels)
+
+    missing_counts = null_counts + sentinel_counts
+    total_rows = len(df)
+
+    return pd.DataFrame({
+        'Feature': df.columns,
+        'Null_Count': null_counts,
+        'Sentinel_Count': sentinel_counts,
+        'Missing_Count': missing_counts,
+        'Missing_Percentage': (missing_counts / total_rows) * 100 if total_rows else np.nan,
+    })
+
+
+@instrumented
+def calculate_nan_percentage_of_grouped_features(df, yaml_path=None, yaml_string=None, sentinels=('?',)):
     """
     Calculate the percentage of missing values for features grouped by categories
-    defined in a YAML file.
+    defined in a YAML file. The dataframe is not modified.
     
     Parameters:
     df (pandas.DataFrame): The input dataframe
     yaml_path (str, optional): Path to the YAML file with feature definitions
     yaml_string (str, optional): String containing YAML content
+    sentinels (iterable, optional): Values counted as missing in addition to null values
     
     Returns:
     pandas.DataFrame: DataFrame with feature names and their missing value percentages
     """
     # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract feature categories from the new structure
-    feature_categories = {}
-    
-    # Handle the new nested structure with fairness category
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        for category in ['sensitive', 'covariate', 'treatment', 'target', 'other']:
-            if category in fairness_data and 'features' in fairness_data[category]:
-                feature_categories[category.capitalize()] = fairness_data[category]['features']
+    schema = load_feature_schema(yaml_path, yaml_string)
     
-    # Total number of rows
-    total_rows = len(df)
-    
-    # Calculate missing values count for each column 
-    df.replace('?', pd.NA, inplace=True)
-    missing_counts = df.isnull().sum()
-    
-    # Calculate percentage of missing values
-    missing_percentages = (missing_counts / total_rows) * 100
-    
-    # Create a DataFrame with results
-    missing_stats = pd.DataFrame({
-        'Feature': missing_counts.index,
-        'Missing_Count': missing_counts.values,
-        'Missing_Percentage': missing_percentages.values
-    }).sort_values('Missing_Percentage', ascending=False)
+    # Calculate missing values count and percentage for each column
+    missing_stats = profile_missing_values(df, sentinels)
+    missing_stats = missing_stats.sort_values('Missing_Percentage', ascending=False)
     
     # Create a new column for feature category
-    def get_category(feature):
-        for category, features in feature_categories.items():
-            if feature in features:
-                return category
-        return 'Uncategorized'
-    
-    missing_stats['Category'] = missing_stats['Feature'].apply(get_category)
+    categories = {feature: role.capitalize() for feature, role in schema.feature_to_role.items()}
+    missing_stats['Category'] = missing_stats['Feature'].map(categories).fillna('Uncategorized')
     
     # Filter out 'Uncategorized' category features if requested
     # By default, include only the categorized features
@@ -259,26 +824,10 @@ def get_numerical_features(df, yaml_path=None, yaml_string=None):
     Returns:
     list: List of numerical feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract numerical features from the new structure
-    numerical_features = []
-    if 'dataset' in yaml_data and 'structural' in yaml_data['dataset']:
-        structural_data = yaml_data['dataset']['structural']
-        if 'numerical' in structural_data and 'features' in structural_data['numerical']:
-            numerical_features = structural_data['numerical']['features']
+    schema = load_feature_schema(yaml_path, yaml_string)
     
     # Filter out numerical features that do not exist in the DataFrame
-    numerical_features = [feature for feature in numerical_features if feature in df.columns]
-    
-    return numerical_features
+    return schema.get_structural_features('numerical', df.columns)
 
 
 def get_categorical_features(df, yaml_path=None, yaml_string=None):
@@ -292,26 +841,10 @@ def get_categorical_features(df, yaml_path=None, yaml_string=None):
     Returns:
     list: List of categorical feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract categorical features from the new structure
-    categorical_features = []
-    if 'dataset' in yaml_data and 'structural' in yaml_data['dataset']:
-        structural_data = yaml_data['dataset']['structural']
-        if 'categorical' in structural_data and 'features' in structural_data['categorical']:
-            categorical_features = structural_data['categorical']['features']
+    schema = load_feature_schema(yaml_path, yaml_string)
     
     # Filter out categorical features that do not exist in the DataFrame
-    categorical_features = [feature for feature in categorical_features if feature in df.columns]
-    
-    return categorical_features
+    return schema.get_structural_features('categorical', df.columns)
 
 def get_sensitive_features(yaml_path=None, yaml_string=None):
     """
@@ -324,23 +857,7 @@ def get_sensitive_features(yaml_path=None, yaml_string=None):
     Returns:
     list: List of sensitive feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract sensitive features from the new structure
-    sensitive_features = []
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        if 'sensitive' in fairness_data and 'features' in fairness_data['sensitive']:
-            sensitive_features = fairness_data['sensitive']['features']
-    
-    return sensitive_features
+    return load_feature_schema(yaml_path, yaml_string).get_features('sensitive')
 
 def get_covariate_features(yaml_path=None, yaml_string=None):
     """
@@ -353,23 +870,7 @@ def get_covariate_features(yaml_path=None, yaml_string=None):
     Returns:
     list: List of covariate feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract covariate features from the new structure
-    covariate_features = []
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        if 'covariate' in fairness_data and 'features' in fairness_data['covariate']:
-            covariate_features = fairness_data['covariate']['features']
-    
-    return covariate_features
+    return load_feature_schema(yaml_path, yaml_string).get_features('covariate')
 
 def get_treatment_features(yaml_path=None, yaml_string=None):
     """
@@ -382,23 +883,7 @@ def get_treatment_features(yaml_path=None, yaml_string=None):
     Returns:
     list: List of treatment feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract treatment features from the new structure
-    treatment_features = []
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        if 'treatment' in fairness_data and 'features' in fairness_data['treatment']:
-            treatment_features = fairness_data['treatment']['features']
-    
-    return treatment_features
+    return load_feature_schema(yaml_path, yaml_string).get_features('treatment')
 
 def get_target_features(yaml_path=None, yaml_string=None):
     """
@@ -411,23 +896,7 @@ def get_target_features(yaml_path=None, yaml_string=None):
     Returns:
     list: List of target feature names
     """
-    # Load feature categories from YAML
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
-    else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
-    
-    # Extract target features from the new structure
-    target_features = []
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        if 'target' in fairness_data and 'features' in fairness_data['target']:
-            target_features = fairness_data['target']['features']
-    
-    return target_features
+    return load_feature_schema(yaml_path, yaml_string).get_features('target')
 
 
 def map_icd9_category(code):
@@ -484,41 +953,302 @@ def map_icd9_category(code):
         return "Injury and Poisoning"
     else:
         return "Other"
-    
-    
+
+
+# Left edges of the ICD-9 code ranges used by map_icd9_category and the category of each
+# interval [edge_i, edge_i+1); codes below the first edge or from the last edge on are "Other"
+_ICD9_BOUNDARIES = np.array([1, 140, 240, 250, 251, 280, 290, 320, 390, 460, 520,
+                             580, 630, 680, 710, 740, 760, 780, 800, 1000])
+_ICD9_BIN_CATEGORIES = np.array([
+    "Other",
+    "Infectious Diseases",
+    "Neoplasms (Cancer)",
+    "Endocrine, Metabolic, and Nutritional Diseases",
+    "Diabetes",
+    "Endocrine, Metabolic, and Nutritional Diseases",
+    "Blood Diseases",
+    "Mental Disorders",
+    "Nervous System Disorders",
+    "Circulatory System Diseases",
+    "Respiratory Diseases",
+    "Digestive System Diseases",
+    "Genitourinary Diseases",
+    "Pregnancy-related Conditions",
+    "Skin Diseases",
+    "Musculoskeletal Disorders",
+    "Congenital Anomalies",
+    "Perinatal Conditions",
+    "Symptoms, Signs, and Ill-defined Conditions",
+    "Injury and Poisoning",
+    "Other",
+], dtype=object)
+
+
+@instrumented
+def map_icd9_category_series(codes):
+    """
+    Vectorized version of map_icd9_category for a whole column of ICD-9 codes.
+
+    Every distinct code is parsed once with vectorized string operations and binned with
+    np.searchsorted over the range boundaries. V/E codes map to "Other", missing values and
+    '?' to "Unknown", exactly as in map_icd9_category.
+
+    Parameters:
+    -----------
+    codes : pandas.Series
+        Column with ICD-9 codes (strings or numbers)
+
+    Returns:
+    --------
+    pandas.Series
+        Categorical series with the same index as codes. Only the categories that occur are
+        kept and they are sorted, so pd.get_dummies creates the same columns as for the
+        output of map_icd9_category.
+    """
+    value_codes, uniques = pd.factorize(codes)
+    uniques = pd.Series(uniques, dtype=object)
+
+    # Same parsing as map_icd9_category: drop the decimal part and accept only integers
+    integer_part = uniques.astype(str).str.split(".", n=1).str[0]
+    is_integer = integer_part.str.fullmatch(r"\s*[+-]?[0-9](?:_?[0-9])*\s*").fillna(False).to_numpy(dtype=bool)
+    numbers = pd.to_numeric(integer_part.where(is_integer).str.replace("_", "", regex=False), errors="coerce")
+
+    bins = np.searchsorted(_ICD9_BOUNDARIES, numbers.fillna(0).to_numpy(), side="right")
+    unique_categories = _ICD9_BIN_CATEGORIES[bins]
+    unique_categories[~is_integer] = "Other"
+    unique_categories[(uniques == "?").to_numpy(dtype=bool)] = "Unknown"
+
+    # pd.factorize marks missing values with -1, which selects the trailing "Unknown"
+    if (value_codes == -1).any():
+        unique_categories = np.append(unique_categories, "Unknown")
+    categories, category_codes = np.unique(unique_categories, return_inverse=True)
+    mapped = pd.Categorical.from_codes(category_codes[value_codes], categories=categories)
+
+    return pd.Series(mapped, index=codes.index, name=codes.name)
+
+
 def order_columns(df, yaml_path=None, yaml_string=None):
 
-    if yaml_path:
-        with open(yaml_path, 'r') as file:
-            yaml_data = yaml.safe_load(file)
-    elif yaml_string:
-        yaml_data = yaml.safe_load(yaml_string)
+    schema = load_feature_schema(yaml_path, yaml_string)
+
+    return schema.ordered_features(df.columns)
+
+
+def match_encoded_columns(columns, features, encoded_features=None):
+    """
+    Maps each column to the feature it was created from: the feature of the same name, or
+    for a one-hot encoded column named '<feature>_<level>' the longest feature of
+    encoded_features that is such a prefix. Only the prefixes of a column name that end
+    before an underscore are looked up, so the cost is linear in the length of the names
+    instead of comparing every column with every feature.
+    
+    Parameters:
+    -----------
+    columns : iterable
+        Column names, e.g. of a one-hot encoded dataframe
+    features : list
+        Names of the features before encoding
+    encoded_features : iterable, optional
+        Features whose columns are encoded (by default all features). Columns named like
+        one of these features are not matched to it, as the feature has been replaced by
+        its indicator columns.
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Position in features of the feature of each column, -1 for unmatched columns
+    """
+    feature_positions = {}
+    for position, feature in enumerate(features):
+        feature_positions.setdefault(feature, position)
+    if encoded_features is None:
+        encoded_positions = feature_positions
+        exact_positions = feature_positions
     else:
-        raise ValueError("Either yaml_path or yaml_string must be provided")
+        encoded_features = set(encoded_features)
+        encoded_positions = {feature: position for feature, position in feature_positions.items()
+                             if feature in encoded_features}
+        exact_positions = {feature: position for feature, position in feature_positions.items()
+                           if feature not in encoded_features}
+
+    matches = []
+    for column in columns:
+        position = exact_positions.get(column, -1)
+        if position < 0 and isinstance(column, str):
+            # Longest prefix first
+            separator = column.rfind('_')
+            while separator > 0:
+                position = encoded_positions.get(column[:separator], -1)
+                if position >= 0:
+                    break
+                separator = column.rfind('_', 0, separator)
+        matches.append(position)
+    return np.array(matches, dtype=np.int64)
+
+
+@instrumented
+def resolve_roles(df, schema, encoded_features=None):
+    """
+    Resolves the fairness role of each column of a (one-hot encoded) dataframe from the
+    raw feature schema, see match_encoded_columns().
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The dataframe, e.g. after one-hot encoding
+    schema : FeatureSchema
+        Schema of the features before encoding (see load_feature_schema)
+    encoded_features : iterable, optional
+        Features that were one-hot encoded, by default all features
     
-    ordered_features = []
-    if 'dataset' in yaml_data and 'fairness' in yaml_data['dataset']:
-        fairness_data = yaml_data['dataset']['fairness']
-        if 'sensitive' in fairness_data and 'features' in fairness_data['sensitive']: 
-            ordered_features += [feature for feature in fairness_data['sensitive']['features'] if feature in df.columns]
-        if 'covariate' in fairness_data and 'features' in fairness_data['covariate']:    
-            ordered_features += [feature for feature in fairness_data['covariate']['features'] if feature in df.columns]
-        if 'treatment' in fairness_data and 'features' in fairness_data['treatment']:
-            ordered_features += [feature for feature in fairness_data['treatment']['features'] if feature in df.columns]
-        if 'target' in fairness_data and 'features' in fairness_data['target']:    
-            ordered_features += [feature for feature in fairness_data['target']['features'] if feature in df.columns]
-        if 'other' in fairness_data and 'features' in fairness_data['other']:    
-            ordered_features += [feature for feature in fairness_data['other']['features'] if feature in df.columns]
+    Returns:
+    --------
+    dict
+        Mapping from each fairness role to the array of positions of its columns in df,
+        ordered as the features in the schema and then as the columns in df
+    """
+    features = list(schema.feature_to_role)
+    matches = match_encoded_columns(df.columns, features, encoded_features)
+    matched = np.flatnonzero(matches >= 0)
+    # Stable sort by feature position keeps the indicator columns of a feature in df order
+    matched = matched[np.argsort(matches[matched], kind='stable')]
 
-    return ordered_features
+    role_codes = np.array([FAIRNESS_ROLES.index(schema.feature_to_role[feature]) for feature in features],
+                          dtype=np.int64)
+    column_roles = role_codes[matches[matched]] if len(features) else np.array([], dtype=np.int64)
+    return {role: matched[column_roles == code] for code, role in enumerate(FAIRNESS_ROLES)}
 
 
+@instrumented
 def maintain_order_columns(df, original_order, categorical_features):
+    # Columns of categorical features are the indicator columns '<feature>_<level>'
+    matches = match_encoded_columns(df.columns, list(original_order), categorical_features)
+    categorical_features = set(categorical_features)
+
+    columns_of_feature = {}
+    for column, position in zip(df.columns, matches):
+        if position >= 0:
+            columns_of_feature.setdefault(position, []).append(column)
+
     new_columns = []
-    for col in original_order:
+    for position, col in enumerate(original_order):
         if col in categorical_features:
-            new_columns.extend([c for c in df.columns if c.startswith(col + '_')])
+            new_columns.extend(columns_of_feature.get(position, []))
         else:
             new_columns.append(col)
 
-    return df[new_columns]
\ No newline at end of file
+    return df[new_columns]
+
+
+@instrumented
+def one_hot_encode(df, categorical_features, sparse=False, drop=None, categories=None):
+    """
+    One-hot encodes categorical features as compact uint8 indicator columns.
+    
+    The indicator columns of a feature replace the feature at its position, so the column
+    order of df is kept (as with pd.get_dummies followed by maintain_order_columns). Column
+    names and the order of the indicators match pd.get_dummies; missing values get no indicator.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The dataframe to encode
+    categorical_features : list
+        Names of the columns to encode
+    sparse : bool
+        If True, the indicator columns are pandas sparse columns with fill value 0
+    drop : list, optional
+        Names of indicator columns that are not created (e.g. the redundant one of a binary feature)
+    categories : dict, optional
+        Mapping from feature to the values that get an indicator column, in order. Other values
+        get no indicator. By default the sorted values of the feature (or its categories).
+    
+    Returns:
+    --------
+    tuple
+        The encoded dataframe and a dictionary mapping each encoded feature to the list of its
+        indicator columns
+    """
+    categorical_features = set(categorical_features)
+    drop = set(drop or [])
+    indicator_dtype = pd.SparseDtype(np.uint8, 0) if sparse else np.uint8
+    n_rows = len(df)
+
+    blocks = []
+    passthrough = []
+    dummy_columns = {}
+
+    for position, column in enumerate(df.columns):
+        if column not in categorical_features:
+            passthrough.append(position)
+            continue
+        if passthrough:
+            blocks.append(df.iloc[:, passthrough])
+            passthrough = []
+
+        values = df.iloc[:, position]
+        if categories is not None and column in categories:
+            # Values that are not among the given categories get code -1, like missing values
+            levels = pd.Index(categories[column])
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                category_codes = np.append(levels.get_indexer(values.cat.categories), -1)
+                codes = category_codes[values.cat.codes.to_numpy()]
+            else:
+                codes = levels.get_indexer(values)
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            codes, levels = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, levels = pd.factorize(values, sort=True)
+
+        names = [f"{column}_{level}" for level in levels]
+        keep = [code for code, name in enumerate(names) if name not in drop]
+        dummy_columns[column] = [names[code] for code in keep]
+
+        # Map each code to its indicator column, -1 for missing values and dropped levels
+        indicator_position = np.full(len(levels) + 1, -1, dtype=np.int64)
+        indicator_position[keep] = np.arange(len(keep))
+        rows_positions = indicator_position[codes]
+        rows = np.flatnonzero(rows_positions >= 0)
+
+        indicators = np.zeros((n_rows, len(keep)), dtype=np.uint8)
+        indicators[rows, rows_positions[rows]] = 1
+        block = pd.DataFrame(indicators, index=df.index, columns=dummy_columns[column], copy=False)
+        if sparse:
+            block = block.astype(indicator_dtype)
+        blocks.append(block)
+
+    if passthrough:
+        blocks.append(df.iloc[:, passthrough])
+
+    if not blocks:
+        return df.iloc[:, []], dummy_columns
+    return pd.concat(blocks, axis=1), dummy_columns
+
+
+def expand_encoded_features(features, dummy_columns, columns=None):
+    """
+    Replaces the encoded features of a list by their indicator columns, e.g. to get the
+    fairness roles of the columns of a one-hot encoded dataframe.
+    
+    Parameters:
+    -----------
+    features : list
+        Names of features before encoding
+    dummy_columns : dict
+        Mapping from encoded feature to its indicator columns, as returned by one_hot_encode
+    columns : iterable, optional
+        If provided, only features and indicator columns contained in it are returned
+    
+    Returns:
+    --------
+    list
+        List of column names
+    """
+    expanded = []
+    for feature in features:
+        expanded.extend(dummy_columns.get(feature, [feature]))
+
+    if columns is None:
+        return expanded
+    columns = set(columns)
+    return [column for column in expanded if column in columns]